@@ -1,3 +1,18 @@
 from .client import ClientAI
-from .errors import EditingError, ErrorAI, SuggestionError, WarningError
+from .complexity import ComplexityClassifier
+from .errors import (
+    EditingError,
+    ErrorAI,
+    SuggestionError,
+    TranslationError,
+    WarningError,
+)
+from .explanations import ExplanationCache
+from .parts import ExplanationParts
+from .providers.api import ProviderAI
+from .providers.cached import ProviderCachedExplanations
 from .providers.openai import ProviderOpenAI
+from .providers.parallel import ProviderParallelExplanations
+from .providers.routing import ProviderRouter
+from .providers.stub import ProviderStub
+from .singleflight import SingleFlight
@@ -4,7 +4,14 @@ from typing import Any, Optional
 
 import jsonschema
 
-from .errors import EditingError, ErrorAI, SuggestionError, WarningError
+from .errors import (
+    EditingError,
+    ErrorAI,
+    SuggestionError,
+    TranslationError,
+    WarningError,
+)
+from .parsing import IncrementalJSONObjectParser
 from .providers.api import ProviderAI
 
 
@@ -22,6 +29,35 @@ class ClientAI:
         },
         "required": ["dangerous_to_run"],
     }
+    __shell_commands_jsonschema = {
+        "type": "object",
+        "properties": {
+            "shell_commands": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["shell_commands"],
+    }
+    __warnings_jsonschema = {
+        "type": "object",
+        "properties": {
+            "evaluations": {"type": "array", "items": __warning_jsonschema}
+        },
+        "required": ["evaluations"],
+    }
+    __shell_script_jsonschema = {
+        "type": "object",
+        "properties": {"shell_script": {"type": "string"}},
+        "required": ["shell_script"],
+    }
+    __analysis_jsonschema: dict[str, Any] = {
+        "type": "object",
+        "properties": {
+            "shell_command": {"type": "string"},
+            "dangerous_to_run": {"type": "boolean"},
+            "dangerous_consequences": {"type": "string"},
+            "explanation": {"type": "string"},
+        },
+        "required": ["shell_command", "dangerous_to_run", "explanation"],
+    }
 
     def __init__(self, api: ProviderAI) -> None:
         self.__api = api
@@ -32,13 +68,111 @@ class ClientAI:
             response, self.__shell_command_jsonschema, SuggestionError
         )["shell_command"]
 
-        if shell_command == "":
+        return self.__check_suggested_shell_command(shell_command, prompt)
+
+    async def suggest_shell_commands(self, prompt: str, n: int) -> list[str]:
+        response = await self.__api.suggest_shell_commands(prompt, n)
+        shell_commands = self.__validate_response(
+            response, self.__shell_commands_jsonschema, SuggestionError
+        )["shell_commands"]
+
+        # Remove empty and duplicate suggestions, keeping the order
+        shell_commands = list(dict.fromkeys(filter(None, shell_commands)))
+
+        if not shell_commands:
             raise SuggestionError(
-                f"Failed to suggest a shell command on request: {prompt}.\n"
-                "The suggested shell command is empty."
+                f"Failed to suggest shell commands on request: {prompt}.\n"
+                "The suggested shell commands are empty."
             )
         else:
-            return shell_command
+            return shell_commands
+
+    async def suggest_shell_command_with_analysis(
+        self, prompt: str
+    ) -> AsyncGenerator[tuple[str, Any], None]:
+        """
+        Suggests a shell command, recognises whether it is dangerous and
+        explains it in a single request. The parts are yielded as soon as
+        they are received:
+
+        - `("shell_command", str)`,
+        - `("warning", tuple[bool, str])`,
+        - `("explanation", str)` for every chunk of the explanation.
+        """
+
+        stream = await self.__api.suggest_shell_command_with_analysis(prompt)
+
+        try:
+            async for part in self.__parse_analysis(stream, prompt):
+                yield part
+        except Exception:
+            # The prompt is going to be sent again by another request
+            await self.__api.discard_shell_command_with_analysis(stream)
+            raise
+
+    async def __parse_analysis(
+        self, stream: Any, prompt: str
+    ) -> AsyncGenerator[tuple[str, Any], None]:
+        parser = IncrementalJSONObjectParser()
+        s = ""
+        response: dict[str, Any] = {}
+        shell_command = None
+        is_warning_sent = False
+
+        try:
+            async for (
+                chunk
+            ) in self.__api.get_shell_command_with_analysis_by_chunks(stream):
+                s += chunk
+                for event, key, value in parser.feed(chunk):
+                    if event == "complete":
+                        self.__validate_field(key, value)
+                        response[key] = value
+
+                    if key == "shell_command" and event == "complete":
+                        shell_command = self.__check_suggested_shell_command(
+                            value, prompt
+                        )
+                        yield "shell_command", shell_command
+                    elif is_warning_sent:
+                        pass
+                    elif key == "explanation" or (
+                        event == "complete"
+                        and (
+                            key == "dangerous_consequences"
+                            or (key == "dangerous_to_run" and not value)
+                        )
+                    ):
+                        if shell_command is None:
+                            raise SuggestionError(
+                                f"LLM's response {response} doesn't start with a shell command."
+                            )
+                        elif "dangerous_to_run" not in response:
+                            raise SuggestionError(
+                                f"LLM's response {response} doesn't recognise whether the shell command is dangerous before explaining it."
+                            )
+                        yield "warning", self.__check_warning(
+                            response, shell_command
+                        )
+                        is_warning_sent = True
+
+                    if key == "explanation" and event == "partial":
+                        yield "explanation", value
+
+            parser.close()
+        except ValueError:
+            raise SuggestionError(f"LLM's response is not a valid JSON: {s}.")
+        except (LookupError, TypeError) as e:
+            raise SuggestionError(
+                f"LLM's response {response} can't be parsed: {e!r}."
+            )
+
+        try:
+            jsonschema.validate(response, self.__analysis_jsonschema)
+        except jsonschema.ValidationError:
+            raise SuggestionError(
+                f"LLM's response {response} doesn't match the expected JSON schema {self.__analysis_jsonschema}."
+            )
 
     async def recognise_dangerous_command(
         self, shell_command: str
@@ -48,21 +182,27 @@ class ClientAI:
             response, self.__warning_jsonschema, WarningError
         )
 
-        is_dangerous = evaluation["dangerous_to_run"]
-        dangerous_consequences = evaluation.get("dangerous_consequences", "")
+        return self.__check_warning(evaluation, shell_command)
 
-        if not is_dangerous:
-            return False, ""
-        elif dangerous_consequences == "":
-            raise WarningError(
-                f"Expected dangerous consequences for {shell_command}, but got an empty string."
-            )
-        elif "\n" in dangerous_consequences:
+    async def recognise_dangerous_commands(
+        self, shell_commands: list[str]
+    ) -> list[tuple[bool, str]]:
+        response = await self.__api.recognise_dangerous_commands(
+            shell_commands
+        )
+        evaluations = self.__validate_response(
+            response, self.__warnings_jsonschema, WarningError
+        )["evaluations"]
+
+        if len(evaluations) != len(shell_commands):
             raise WarningError(
-                f"Unexpected newline in dangerous consequences for {shell_command}: {dangerous_consequences}."
+                f"Expected {len(shell_commands)} evaluations, but got {len(evaluations)}."
             )
-        else:
-            return True, dangerous_consequences
+
+        return [
+            self.__check_warning(evaluation, shell_command)
+            for evaluation, shell_command in zip(evaluations, shell_commands)
+        ]
 
     async def get_explanation_of_shell_command(
         self, shell_command: str, *, model: Optional[str] = None
@@ -79,6 +219,9 @@ class ClientAI:
         ) in self.__api.get_explanation_of_shell_command_by_chunks(stream):
             yield chunk
 
+    async def discard_explanation_of_shell_command(self, stream: Any) -> None:
+        await self.__api.discard_explanation_of_shell_command(stream)
+
     async def edit_shell_command(self, shell_command: str, prompt: str) -> str:
         response = await self.__api.edit_shell_command(shell_command, prompt)
         shell_command = self.__validate_response(
@@ -93,6 +236,65 @@ class ClientAI:
         else:
             return shell_command
 
+    async def translate_shell_script(self, script: str, shell: str) -> str:
+        response = await self.__api.translate_shell_script(script, shell)
+        translation = self.__validate_response(
+            response, self.__shell_script_jsonschema, TranslationError
+        )["shell_script"]
+
+        if not translation.strip():
+            raise TranslationError(
+                f"Failed to translate {script} to {shell}.\n"
+                "The translated script is empty."
+            )
+        else:
+            return translation
+
+    async def warm_up(self) -> None:
+        await self.__api.warm_up()
+
+    def __check_suggested_shell_command(
+        self, shell_command: str, prompt: str
+    ) -> str:
+        if shell_command == "":
+            raise SuggestionError(
+                f"Failed to suggest a shell command on request: {prompt}.\n"
+                "The suggested shell command is empty."
+            )
+        else:
+            return shell_command
+
+    def __check_warning(
+        self, evaluation: dict[str, Any], shell_command: str
+    ) -> tuple[bool, str]:
+        is_dangerous = evaluation["dangerous_to_run"]
+        dangerous_consequences = evaluation.get("dangerous_consequences", "")
+
+        if not is_dangerous:
+            return False, ""
+        elif dangerous_consequences == "":
+            raise WarningError(
+                f"Expected dangerous consequences for {shell_command}, but got an empty string."
+            )
+        elif "\n" in dangerous_consequences:
+            raise WarningError(
+                f"Unexpected newline in dangerous consequences for {shell_command}: {dangerous_consequences}."
+            )
+        else:
+            return True, dangerous_consequences
+
+    def __validate_field(self, key: str, value: Any) -> None:
+        schema = self.__analysis_jsonschema["properties"]
+        if key not in schema:
+            return
+
+        try:
+            jsonschema.validate(value, schema[key])
+        except jsonschema.ValidationError:
+            raise SuggestionError(
+                f"LLM's response has an unexpected value of {key}: {value}."
+            )
+
     def __validate_response(
         self, s: str, schema: dict[str, Any], error: type[ErrorAI]
     ) -> dict[str, Any]:
@@ -0,0 +1,260 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Optional
+
+from shell_whiz.shell import ShellSyntaxError, parse
+
+# Words that usually mean more than a single simple command is needed
+_COMPLEX_WORDS = frozenset(
+    {
+        "archive",
+        "awk",
+        "batch",
+        "compare",
+        "concurrently",
+        "convert",
+        "cron",
+        "deduplicate",
+        "docker",
+        "encrypt",
+        "extract",
+        "ffmpeg",
+        "iptables",
+        "json",
+        "kubectl",
+        "loop",
+        "merge",
+        "parallel",
+        "parse",
+        "rebase",
+        "recursively",
+        "regex",
+        "rename",
+        "replace",
+        "rsync",
+        "script",
+        "sed",
+        "ssh",
+        "sum",
+        "systemd",
+        "transform",
+    }
+)
+
+_SIMPLE_WORDS = frozenset(
+    {
+        "current",
+        "display",
+        "list",
+        "open",
+        "print",
+        "show",
+        "version",
+        "what",
+        "where",
+        "which",
+        "who",
+    }
+)
+
+_CONDITION_WORDS = frozenset(
+    {"but", "each", "every", "except", "if", "only", "unless", "without"}
+)
+
+_WEIGHTS = {
+    "words": 0.02,
+    "complex_words": 0.3,
+    "simple_words": -0.15,
+    "condition_words": 0.15,
+    "commands": 0.15,
+    "arguments": 0.03,
+    "substitutions": 0.25,
+    "redirections": 0.05,
+    "unparsed": 1.0,
+    "revise_rate": 0.5,
+}
+
+# Outcomes that mean the suggestion or explanation wasn't good enough
+_BAD_OUTCOMES = frozenset({"revised", "edited", "escalated"})
+
+
+def _get_prompt_features(prompt: str) -> dict[str, float]:
+    words = re.findall(r"[\w'-]+", prompt.lower())
+    return {
+        "words": len(words),
+        "complex_words": sum(word in _COMPLEX_WORDS for word in words),
+        "simple_words": sum(word in _SIMPLE_WORDS for word in words),
+        "condition_words": sum(word in _CONDITION_WORDS for word in words),
+    }
+
+
+def _get_command_features(shell_command: str) -> dict[str, float]:
+    try:
+        command_list = parse(shell_command)
+    except ShellSyntaxError:
+        return {"unparsed": 1}
+
+    commands = command_list.commands
+    return {
+        "commands": len(commands),
+        "arguments": sum(len(command.arguments) for command in commands),
+        "substitutions": sum(
+            len(command.substitutions) for command in commands
+        ),
+        "redirections": sum(len(command.redirections) for command in commands),
+    }
+
+
+class ComplexityClassifier:
+    """
+    Cheap local classifier that picks a model for each request. It scores
+    the prompt or the shell command by a few features and escalates to
+    `strong_model` only if the score reaches `threshold`. The score grows
+    with the share of recent sessions in which the user had to revise
+    the result.
+
+    Decisions and outcomes are appended to a JSON Lines log at
+    `log_path`, so the weights can be re-tuned from real usage. The log
+    is written by a background thread, so requests never wait for it.
+    """
+
+    def __init__(
+        self,
+        *,
+        fast_model: str = "gpt-4o-mini",
+        strong_model: str = "gpt-4o",
+        threshold: float = 0.8,
+        log_path: Optional[str] = None,
+        max_log_size: int = 1024 * 1024,
+        history_size: int = 50,
+    ) -> None:
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.__threshold = threshold
+        self.__log_path = log_path
+        self.__session = uuid.uuid4().hex
+
+        self.__queue: queue.Queue[Optional[dict[str, Any]]] = queue.Queue()
+        self.__writer: Optional[threading.Thread] = None
+
+        self.__revise_rate = 0.0
+        if log_path:
+            self.__load_history(log_path, max_log_size, history_size)
+
+    def choose(self, stage: str, text: str) -> str:
+        """
+        Returns the model for a request of the given stage. The text is
+        a prompt for suggestion stages and a shell command for the others.
+        """
+
+        if stage.startswith("suggest_shell_command"):
+            features = _get_prompt_features(text)
+        elif stage == "edit_shell_command":
+            shell_command, _, prompt = text.partition("\n\n")
+            features = _get_command_features(
+                shell_command
+            ) | _get_prompt_features(prompt)
+        else:
+            features = _get_command_features(text)
+        features["revise_rate"] = self.__revise_rate
+
+        score = sum(_WEIGHTS[name] * value for name, value in features.items())
+        is_complex = score >= self.__threshold
+
+        model = self.strong_model if is_complex else self.fast_model
+
+        self.__log(
+            {
+                "stage": stage,
+                "features": features,
+                "score": round(score, 3),
+                "model": model,
+            }
+        )
+
+        return model
+
+    def record_outcome(self, outcome: str) -> None:
+        """Logs what the user did with the result, e.g. `revised`."""
+
+        self.__log({"outcome": outcome})
+
+    def close(self) -> None:
+        """Waits until the logged entries are written."""
+
+        if self.__writer is not None:
+            self.__queue.put(None)
+            self.__writer.join()
+            self.__writer = None
+
+    def __log(self, entry: dict[str, Any]) -> None:
+        if not self.__log_path:
+            return
+
+        if self.__writer is None:
+            self.__writer = threading.Thread(
+                target=self.__write, args=(self.__log_path,), daemon=True
+            )
+            self.__writer.start()
+
+        self.__queue.put(
+            {"time": round(time.time()), "session": self.__session} | entry
+        )
+
+    def __write(self, log_path: str) -> None:
+        is_closed = False
+        while not is_closed:
+            batch = [self.__queue.get()]
+            while not self.__queue.empty():
+                batch.append(self.__queue.get_nowait())
+
+            entries = [entry for entry in batch if entry is not None]
+            is_closed = len(entries) < len(batch)
+
+            try:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                with open(log_path, mode="a") as f:
+                    f.writelines(json.dumps(entry) + "\n" for entry in entries)
+            except os.error:
+                pass
+
+    def __load_history(
+        self, log_path: str, max_log_size: int, history_size: int
+    ) -> None:
+        try:
+            with open(log_path) as f:
+                lines = f.readlines()
+        except (os.error, UnicodeDecodeError):
+            return
+
+        # Keep the newer half of the log once it grows too large
+        if sum(len(line) for line in lines) > max_log_size:
+            lines = lines[len(lines) // 2 :]
+            try:
+                with open(log_path + ".tmp", mode="w") as f:
+                    f.writelines(lines)
+                os.replace(log_path + ".tmp", log_path)
+            except os.error:
+                pass
+
+        sessions: dict[str, bool] = {}
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict) and "outcome" in entry:
+                sessions[entry.get("session", "")] = (
+                    sessions.get(entry.get("session", ""), False)
+                    or entry["outcome"] in _BAD_OUTCOMES
+                )
+
+        recent = deque(sessions.values(), maxlen=history_size)
+        if recent:
+            self.__revise_rate = sum(recent) / len(recent)
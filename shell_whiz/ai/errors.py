@@ -12,3 +12,7 @@ class WarningError(ErrorAI):
 
 class EditingError(ErrorAI):
     pass
+
+
+class TranslationError(ErrorAI):
+    pass
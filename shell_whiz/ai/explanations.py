@@ -0,0 +1,246 @@
+import asyncio
+import re
+from typing import Any, Optional
+
+from shell_whiz.cache import read_json, write_json
+from shell_whiz.shell import Command, Redirection, read_manual
+
+_REDIRECTIONS = {
+    ">": "writes the output to a file.",
+    ">|": "writes the output to a file.",
+    ">>": "appends the output to a file.",
+    "<": "reads the input from a file.",
+    "<>": "opens a file for reading and writing.",
+    "<<": "passes a here-document as the input.",
+    "<<-": "passes a here-document as the input.",
+    "<<<": "passes a string as the input.",
+    "&>": "writes both the output and errors to a file.",
+    "&>>": "appends both the output and errors to a file.",
+    ">&": "redirects the output to another file descriptor.",
+    "<&": "duplicates an input file descriptor.",
+}
+
+
+def _describe_redirection(redirection: Redirection) -> str:
+    operator = redirection.operator.lstrip("0123456789")
+    fd = redirection.operator[: len(redirection.operator) - len(operator)]
+
+    if operator == ">&" and redirection.target == "1" and fd == "2":
+        return "redirects errors to the output."
+    elif operator == ">&" and redirection.target == "2":
+        return "redirects the output to errors."
+
+    description = _REDIRECTIONS[operator]
+    if fd == "2":
+        description = description.replace("the output", "errors")
+
+    return description
+
+
+def _is_data(value: str) -> bool:
+    """Checks whether an argument is most likely a path or a value."""
+
+    return (
+        "=" not in value
+        and not value.startswith("-")
+        and (
+            value == ""
+            or value.isdigit()
+            or any(c in value for c in "/.~*?$:@%")
+            or " " in value
+        )
+    )
+
+
+class ExplanationCache:
+    """
+    Persistent cache of explanations of programs and their flags.
+    It is filled from previous explanations received from LLM and,
+    as a fallback, from man pages.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.__path = path
+        self.__is_modified = False
+
+        programs = read_json(path)
+        self.__programs: dict[str, dict[str, Any]] = (
+            programs if isinstance(programs, dict) else {}
+        )
+
+    def save(self) -> None:
+        if self.__is_modified and write_json(self.__path, self.__programs):
+            self.__is_modified = False
+
+    def learn(self, explanation: str) -> None:
+        """Remembers programs and flags from an explanation in Markdown."""
+
+        entry = None
+        for line in explanation.splitlines():
+            match = re.match(r"^(\s*)- `([^`]+)` (\S.*)$", line)
+            if not match:
+                continue
+
+            indent, code, description = match.groups()
+
+            if not indent:
+                code = re.sub(r"^(\|\||&&|\||;)\s*", "", code)
+                code = code.removesuffix(" ...")
+                match = re.match(r"[\w.+][\w.+-]*( [a-z][\w-]*)?", code)
+                if not match:
+                    entry = None
+                    continue
+
+                # Only learn the description of the bare program, since
+                # it may depend on flags and arguments
+                name = match.group()
+                entry = self.__programs.setdefault(name, {})
+                if name == code:
+                    entry["description"] = description
+                    self.__is_modified = True
+            elif (
+                entry is not None
+                and code.startswith("-")
+                and " " not in code
+                and "..." not in code
+            ):
+                entry.setdefault("flags", {})[code] = description
+                self.__is_modified = True
+
+    async def read_manuals(self, commands: list[Command]) -> None:
+        """
+        Reads the man pages of the programs of the commands in background
+        threads, so that `explain` doesn't have to block on them.
+        """
+
+        names = {
+            self.__split_words(command)[0]
+            for command in commands
+            if command.words
+        }
+        names = {
+            name
+            for name in names
+            if "manual" not in self.__programs.get(name, {})
+        }
+
+        manuals = await asyncio.gather(
+            *(
+                asyncio.to_thread(read_manual, name.replace(" ", "-"))
+                for name in names
+            )
+        )
+        for name, (description, flags) in zip(names, manuals):
+            self.__programs.setdefault(name, {})["manual"] = {
+                "description": description,
+                "flags": flags,
+            }
+            self.__is_modified = True
+
+    def explain(self, command: Command, prefix: str = "") -> Optional[str]:
+        """
+        Explains a command in Markdown if all of its parts are known.
+        Returns None otherwise.
+        """
+
+        if not command.words or command.substitutions:
+            return None
+
+        name, arguments = self.__split_words(command)
+
+        description = self.__get_description(name)
+        if not description:
+            return None
+
+        flags = []
+        has_positional_arguments = False
+        for argument in arguments:
+            if _is_data(argument):
+                has_positional_arguments = True
+                continue
+            elif argument in ("-", "--"):
+                continue
+
+            flag_description = self.__get_flag_description(name, argument)
+            if not flag_description:
+                return None
+            flags.append((argument, flag_description))
+
+        lines = [
+            f"- `{prefix}{name}{' ...' if has_positional_arguments else ''}` {description}"
+        ]
+        lines.extend(
+            f"  - `{assignment.text.partition('=')[0]}=...` sets an environment variable for the command."
+            for assignment in command.assignments
+        )
+        lines.extend(f"  - `{flag}` {text}" for flag, text in flags)
+        lines.extend(
+            "  - `{0}` {1}".format(
+                (
+                    redirection.text
+                    if len(redirection.text) <= 24
+                    and "\n" not in redirection.text
+                    else f"{redirection.operator} ..."
+                ),
+                _describe_redirection(redirection),
+            )
+            for redirection in command.redirections
+        )
+
+        return "\n".join(lines) + "\n"
+
+    def __split_words(self, command: Command) -> tuple[str, list[str]]:
+        """Returns the name of the program and its arguments."""
+
+        words = [word.value for word in command.words]
+        if len(words) > 1 and " ".join(words[:2]) in self.__programs:
+            return " ".join(words[:2]), words[2:]
+        else:
+            return words[0], words[1:]
+
+    def __get_description(self, name: str) -> str:
+        entry = self.__programs.get(name, {})
+        if entry.get("description"):
+            return entry["description"]
+
+        manual = self.__get_manual(name)
+        if manual["description"]:
+            return f"— {manual['description']}."
+
+        return ""
+
+    def __get_flag_description(self, name: str, flag: str) -> str:
+        flags = self.__programs.get(name, {}).get("flags", {})
+        if flag in flags:
+            return flags[flag]
+
+        manual_flags = self.__get_manual(name)["flags"]
+
+        key = flag.partition("=")[0]
+        if key in manual_flags:
+            return manual_flags[key] + "."
+        elif (
+            flag.startswith("-")
+            and not flag.startswith("--")
+            and len(flag) > 2
+        ):
+            # Bundled short flags, e.g. `-rf`. Other words are operands,
+            # which are left to LLM
+            descriptions = [
+                flags.get(f"-{c}") or manual_flags.get(f"-{c}")
+                for c in flag[1:]
+            ]
+            if all(descriptions):
+                return (
+                    "; ".join(str(d).rstrip(".") for d in descriptions) + "."
+                )
+
+        return ""
+
+    def __get_manual(self, name: str) -> dict[str, Any]:
+        entry = self.__programs.setdefault(name, {})
+        if "manual" not in entry:
+            description, flags = read_manual(name.replace(" ", "-"))
+            entry["manual"] = {"description": description, "flags": flags}
+            self.__is_modified = True
+        return entry["manual"]
@@ -0,0 +1,142 @@
+import json
+from typing import Any, Optional
+
+
+class IncrementalJSONObjectParser:
+    """
+    Parses a flat JSON object (e.g. function call arguments) as it arrives
+    chunk by chunk.
+
+    `feed` returns a list of events:
+
+    - `("partial", key, text)` for every new piece of a string value,
+    - `("complete", key, value)` once a value has been received completely.
+
+    Raises `ValueError` if the input can't be a JSON object.
+    """
+
+    __whitespace = " \t\r\n"
+
+    def __init__(self) -> None:
+        self.__decoder = json.JSONDecoder()
+        self.__buffer = ""
+        self.__position = 0
+        self.__key: Optional[str] = None
+        self.__partial_length = 0
+        self.__is_started = False
+        self.__is_closed = False
+
+    def feed(self, chunk: str) -> list[tuple[str, str, Any]]:
+        self.__buffer += chunk
+
+        events: list[tuple[str, str, Any]] = []
+        while not self.__is_closed:
+            if self.__key is None:
+                if not self.__parse_key():
+                    break
+            elif not self.__parse_value(events):
+                break
+
+        return events
+
+    def close(self) -> None:
+        if not self.__is_closed:
+            raise ValueError("Unexpected end of the JSON object.")
+
+    def __skip(self, position: int, characters: str) -> int:
+        while (
+            position < len(self.__buffer)
+            and self.__buffer[position] in characters
+        ):
+            position += 1
+        return position
+
+    def __parse_key(self) -> bool:
+        position = self.__skip(self.__position, self.__whitespace)
+        if position >= len(self.__buffer):
+            return False
+
+        if not self.__is_started:
+            if self.__buffer[position] != "{":
+                raise ValueError("Expected the start of a JSON object.")
+            self.__is_started = True
+            self.__position = position + 1
+            return True
+
+        if self.__buffer[position] == "}":
+            self.__is_closed = True
+            self.__position = position + 1
+            return False
+        elif self.__buffer[position] == ",":
+            position = self.__skip(position + 1, self.__whitespace)
+            if position >= len(self.__buffer):
+                return False
+
+        if self.__buffer[position] != '"':
+            raise ValueError("Expected a key of the JSON object.")
+
+        try:
+            key, position = self.__decoder.raw_decode(self.__buffer, position)
+        except json.JSONDecodeError:
+            return False
+
+        position = self.__skip(position, self.__whitespace)
+        if position >= len(self.__buffer):
+            return False
+        elif self.__buffer[position] != ":":
+            raise ValueError("Expected a colon after the key.")
+
+        self.__key = key
+        self.__position = position + 1
+        self.__partial_length = 0
+
+        return True
+
+    def __parse_value(self, events: list[tuple[str, str, Any]]) -> bool:
+        assert self.__key is not None
+
+        position = self.__skip(self.__position, self.__whitespace)
+        if position >= len(self.__buffer):
+            return False
+
+        try:
+            value, end = self.__decoder.raw_decode(self.__buffer, position)
+        except json.JSONDecodeError:
+            if self.__buffer[position] == '"':
+                self.__emit_partial(
+                    events, self.__decode_partial_string(position)
+                )
+            elif self.__buffer[position] not in "tfn-0123456789[{":
+                raise ValueError("Expected a value of the JSON object.")
+            return False
+
+        if isinstance(value, str):
+            self.__emit_partial(events, value)
+        events.append(("complete", self.__key, value))
+
+        self.__key = None
+        self.__position = end
+
+        return True
+
+    def __decode_partial_string(self, position: int) -> str:
+        s = self.__buffer[position:]
+
+        # The string may end in the middle of an escape sequence
+        for end in range(len(s), max(len(s) - 6, 0), -1):
+            try:
+                return json.loads(s[:end] + '"')
+            except json.JSONDecodeError:
+                continue
+
+        return ""
+
+    def __emit_partial(
+        self, events: list[tuple[str, str, Any]], value: str
+    ) -> None:
+        assert self.__key is not None
+
+        start = self.__partial_length
+        if len(value) > start:
+            events.append(("partial", self.__key, value[start:]))
+            self.__partial_length = len(value)
@@ -0,0 +1,88 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Coroutine
+from typing import Any, Union
+
+
+class ExplanationParts:
+    """
+    Explanation assembled from parts. Each part is either Markdown known
+    in advance or a request to explain a part of a shell command. The
+    requests are made concurrently and their results are streamed in
+    the order of the parts.
+    """
+
+    def __init__(
+        self, parts: list[Union[str, Coroutine[Any, Any, Any]]]
+    ) -> None:
+        self.__parts: list[Union[str, "asyncio.Task[Any]"]] = [
+            part if isinstance(part, str) else asyncio.create_task(part)
+            for part in parts
+        ]
+
+    async def start(self) -> None:
+        """
+        Waits for the first request, if any, so that the caller waits for
+        the explanation to begin and gets its errors right away.
+        """
+
+        part = self.__parts[0]
+        if isinstance(part, asyncio.Task):
+            try:
+                await part
+            except BaseException:
+                self.cancel()
+                raise
+
+    async def stream(
+        self,
+        get_chunks: Callable[[Any], AsyncIterator[str]],
+        *,
+        learn: Callable[[int, str], None],
+    ) -> AsyncIterator[str]:
+        """
+        Streams the parts, reading the results of the requests by
+        `get_chunks`. Each explanation that has been received is passed
+        to `learn` along with the index of its part.
+        """
+
+        try:
+            for i, part in enumerate(self.__parts):
+                if isinstance(part, str):
+                    yield part
+                    continue
+
+                explanation = ""
+                async for chunk in get_chunks(await part):
+                    explanation += chunk
+                    yield chunk
+
+                # Parts are separate items of the Markdown list
+                if not explanation.endswith("\n"):
+                    explanation += "\n"
+                    yield "\n"
+
+                learn(i, explanation)
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Cancels the requests that haven't been answered yet."""
+
+        for part in self.__parts:
+            if isinstance(part, asyncio.Task):
+                part.cancel()
+
+    async def discard(self, discard: Callable[[Any], Awaitable[None]]) -> None:
+        """
+        Cancels the requests that haven't been answered yet and passes the
+        results of the others to `discard`, when the explanation isn't
+        going to be streamed.
+        """
+
+        for part in self.__parts:
+            if not isinstance(part, asyncio.Task):
+                continue
+            if not part.done():
+                part.cancel()
+            elif not part.cancelled() and part.exception() is None:
+                await discard(part.result())
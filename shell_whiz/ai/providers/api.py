@@ -17,12 +17,64 @@ class ProviderAI(ABC):
     async def recognise_dangerous_command(self, shell_command: str) -> str:
         """Checks if a shell command is dangerous to run. Returns JSON."""
 
+    @abstractmethod
+    async def suggest_shell_commands(self, prompt: str, n: int) -> str:
+        """
+        Suggests `n` alternative shell commands based on the given prompt
+        in a single request. Returns JSON.
+        """
+
+    @abstractmethod
+    async def suggest_shell_command_with_analysis(self, prompt: str) -> Any:
+        """
+        Suggests a shell command based on the given prompt, recognises
+        whether it is dangerous and explains it in a single request.
+        """
+
+    @abstractmethod
+    async def get_shell_command_with_analysis_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        """
+        Helper function used to stream the JSON received by
+        the `suggest_shell_command_with_analysis` function.
+        """
+
+        # Related issue: https://github.com/python/mypy/issues/5070
+        if False:
+            yield
+
+    async def discard_shell_command_with_analysis(self, stream: Any) -> None:
+        """
+        Removes a failed `suggest_shell_command_with_analysis` request from
+        the conversation, so that the prompt can be sent again. Does
+        nothing by default.
+        """
+
+    @abstractmethod
+    async def recognise_dangerous_commands(
+        self, shell_commands: list[str]
+    ) -> str:
+        """
+        Checks if each of the shell commands is dangerous to run
+        in a single request. Returns JSON.
+        """
+
     @abstractmethod
     async def get_explanation_of_shell_command(
         self, shell_command: str, *, model: Optional[str] = None
     ) -> Any:
         """Explains a shell command."""
 
+    @abstractmethod
+    async def get_overview_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        """
+        Briefly describes how the parts of a shell command work together.
+        The result is streamed by `get_explanation_of_shell_command_by_chunks`.
+        """
+
     @abstractmethod
     async def get_explanation_of_shell_command_by_chunks(
         self, stream: Any
@@ -36,6 +88,25 @@ class ProviderAI(ABC):
         if False:
             yield
 
+    async def discard_explanation_of_shell_command(self, stream: Any) -> None:
+        """
+        Closes the result of `get_explanation_of_shell_command` that isn't
+        going to be streamed. Does nothing by default.
+        """
+
     @abstractmethod
     async def edit_shell_command(self, shell_command: str, prompt: str) -> str:
         """Edits a shell command based on the given prompt. Returns JSON."""
+
+    @abstractmethod
+    async def translate_shell_script(self, script: str, shell: str) -> str:
+        """
+        Translates a part of a shell script to the given shell
+        independently of the conversation. Returns JSON.
+        """
+
+    async def warm_up(self) -> None:
+        """
+        Prepares for the next request, e.g. opens a connection to the API
+        in advance. Does nothing by default.
+        """
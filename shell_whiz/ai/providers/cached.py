@@ -0,0 +1,128 @@
+from collections.abc import AsyncGenerator
+from typing import Any, Optional
+
+from shell_whiz.shell import ShellSyntaxError, parse
+
+from ..explanations import ExplanationCache
+from ..parts import ExplanationParts
+from .api import ProviderAI
+from .wrapper import ProviderWrapper
+
+
+class ProviderCachedExplanations(ProviderWrapper):
+    """
+    Explains programs and flags known to the explanation cache locally.
+    Only the segments of a shell command the cache can't cover are
+    explained by the wrapped provider.
+    """
+
+    def __init__(self, api: ProviderAI, cache: ExplanationCache) -> None:
+        super().__init__(api)
+        self.__cache = cache
+
+    async def get_explanation_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        """Explains a shell command."""
+
+        # An explicitly chosen model is expected to do better than the cache
+        segments = None if model else await self.__split(shell_command)
+        if segments is None:
+            segments = [(shell_command, False)]
+
+        # Each segment the cache can't explain is a request of its own
+        parts = ExplanationParts(
+            [
+                (
+                    text
+                    if is_cached
+                    else self._api.get_explanation_of_shell_command(
+                        text, model=model
+                    )
+                )
+                for text, is_cached in segments
+            ]
+        )
+        await parts.start()
+
+        return parts
+
+    async def get_explanation_of_shell_command_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        """
+        Helper function used to stream the result received by
+        the `get_explanation_of_shell_command` function.
+        """
+
+        if not isinstance(stream, ExplanationParts):
+            async for (
+                chunk
+            ) in self._api.get_explanation_of_shell_command_by_chunks(stream):
+                yield chunk
+            return
+
+        try:
+            async for chunk in stream.stream(
+                self._api.get_explanation_of_shell_command_by_chunks,
+                learn=lambda _, explanation: self.__cache.learn(explanation),
+            ):
+                yield chunk
+        finally:
+            self.__cache.save()
+
+    async def discard_explanation_of_shell_command(self, stream: Any) -> None:
+        """
+        Closes the result of `get_explanation_of_shell_command` that isn't
+        going to be streamed.
+        """
+
+        if isinstance(stream, ExplanationParts):
+            await stream.discard(
+                self._api.discard_explanation_of_shell_command
+            )
+        else:
+            await self._api.discard_explanation_of_shell_command(stream)
+
+    async def __split(
+        self, shell_command: str
+    ) -> Optional[list[tuple[str, bool]]]:
+        """
+        Splits a shell command into segments, each of which is either
+        explained by the cache or has to be explained by LLM.
+        Returns None if nothing can be explained by the cache.
+        """
+
+        try:
+            command_list = parse(shell_command)
+        except ShellSyntaxError:
+            return None
+
+        await self.__cache.read_manuals(command_list.commands)
+
+        segments: list[tuple[str, bool]] = []
+        for i, pipeline in enumerate(command_list.pipelines):
+            separator = command_list.separators[i]
+            for j, command in enumerate(pipeline.commands):
+                if j > 0:
+                    prefix = "| "
+                elif separator.strip():
+                    prefix = f"{separator} "
+                else:
+                    prefix = ""
+
+                explanation = self.__cache.explain(command, prefix)
+                if explanation:
+                    segments.append((explanation, True))
+                elif segments and not segments[-1][1]:
+                    segments[-1] = (
+                        f"{segments[-1][0]} {prefix or '; '}{command.text}",
+                        False,
+                    )
+                else:
+                    segments.append((command.text, False))
+
+        if not any(is_cached for _, is_cached in segments):
+            return None
+
+        return segments
@@ -1,14 +1,111 @@
-from collections.abc import AsyncGenerator
+import json
+import logging
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
 from pathlib import Path
 from typing import Any, Optional
 
+import httpx
 import yaml
-from openai import AsyncOpenAI
+from openai import APIError, AsyncOpenAI, AsyncStream
+from openai.types.chat import ChatCompletionChunk, ChatCompletionMessage
 
+from shell_whiz.cache import Cache
+
+from ..complexity import ComplexityClassifier
+from ..singleflight import LeaderError, SingleFlight
 from .api import ProviderAI
 
+logger = logging.getLogger(__name__)
+
+# Idle connections are kept longer than by default (5 seconds), so that
+# a request made after the user has read the answer doesn't connect again
+_KEEPALIVE_EXPIRY = 120.0
+
+
+class _AnalysisStream:
+    """Stream of a response along with the messages it added."""
+
+    def __init__(self, stream: Any, message: dict[str, Any]) -> None:
+        self.stream = stream
+        self.messages = [message]
+
+
+class _Chunks:
+    """
+    Chunks of a stream converted one by one. Closing it closes the stream,
+    even if it hasn't been iterated yet.
+    """
+
+    def __init__(
+        self, chunks: Any, convert: Callable[[Any], Any], *, url: httpx.URL
+    ) -> None:
+        self.__chunks = chunks
+        self.__convert = convert
+        self.__url = url
+
+    def __aiter__(self) -> "_Chunks":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            chunk = await self.__chunks.__anext__()
+        except LeaderError as e:
+            # The rest of the response is lost along with the other process
+            raise APIError(
+                f"The request failed in another process: {e}",
+                httpx.Request("POST", self.__url),
+                body=None,
+            ) from e
+
+        return self.__convert(chunk)
+
+    async def aclose(self) -> None:
+        if isinstance(self.__chunks, AsyncStream):
+            await self.__chunks.close()
+        else:
+            await self.__chunks.aclose()
+
+
+def _load_prompt(name: str) -> dict[str, Any]:
+    return yaml.safe_load(
+        (Path(__file__).parent.parent / "prompts" / f"{name}.yml").read_text()
+    )
+
 
 class ProviderOpenAI(ProviderAI):
+    """
+    Requests are laid out so that requests of the same stage share the
+    longest possible prefix, which lets the provider reuse its prompt cache:
+
+    1. The function definitions of the stage only, so that other stages
+       don't add their schemas to every request.
+    2. The static system message.
+    3. Stage-specific static content (e.g. few-shot examples).
+    4. Variable content: preferences, then the conversation itself.
+
+    The conversation may be shared by several providers, e.g. by backends
+    of `ProviderRouter`. Messages are added to it only once a request
+    succeeds, so a failed request can be retried by another provider.
+
+    With `single_flight`, identical requests that are in flight at the same
+    time, e.g. in another process, are only sent once.
+    """
+
+    __system_message = {
+        "role": "system",
+        "content": "You are Shell Whiz, an AI assistant for the command line.\n\nUnless I specify otherwise in my preferences, you typically provide expert-level responses.",
+    }
+
+    __stages = (
+        "suggest_shell_command",
+        "recognise_dangerous_command",
+        "edit_shell_command",
+        "suggest_shell_command_with_analysis",
+        "suggest_shell_commands",
+        "recognise_dangerous_commands",
+        "translate_shell_script",
+    )
+
     def __init__(
         self,
         *,
@@ -16,34 +113,57 @@ class ProviderOpenAI(ProviderAI):
         model: str,
         preferences: str,
         organization: Optional[str] = None,
+        base_url: Optional[str] = None,
+        conversation: Optional[list[Any]] = None,
+        classifier: Optional[ComplexityClassifier] = None,
+        environment: Optional[str] = None,
+        single_flight: Optional[SingleFlight] = None,
     ) -> None:
-        self.__client = AsyncOpenAI(api_key=api_key, organization=organization)
+        self.__client = AsyncOpenAI(
+            api_key=api_key,
+            organization=organization,
+            base_url=base_url,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=1000,
+                    max_keepalive_connections=100,
+                    keepalive_expiry=_KEEPALIVE_EXPIRY,
+                ),
+                follow_redirects=True,
+            ),
+        )
 
         self.__model = model
+        self.__classifier = classifier
+        self.__single_flight = single_flight
+
+        self.__prompts = {
+            stage: _load_prompt(stage) for stage in self.__stages
+        }
+        self.__explanation_prompt = _load_prompt("explain_shell_command")
+        self.__overview_prompt = _load_prompt("overview_of_shell_command")
 
-        self.__preferences = (
-            f"These are my preferences: ####\n{preferences}\n####"
+        # The environment is described along with the preferences, so that
+        # it doesn't break the static prefix shared by the requests of a stage
+        content = f"These are my preferences: ####\n{preferences}\n####"
+        if environment:
+            content += f"\n\nThis is my environment: ####\n{environment}\n####"
+        self.__preferences = {"role": "system", "content": content}
+
+        self.__messages: list[Any] = (
+            conversation if conversation is not None else []
         )
+        if not self.__messages:
+            self.__messages.append(self.__preferences)
 
-        self.__messages = [
-            {
-                "role": "system",
-                "content": f"You are Shell Whiz, an AI assistant for the command line.\n\nUnless I specify otherwise in my preferences below, you typically provide expert-level responses.\n\n{self.__preferences}",
-            }
-        ]
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
 
     async def suggest_shell_command(self, prompt: str) -> str:
         """Suggests a shell command based on the given prompt. Returns JSON."""
 
         message = await self.__continue_conversation(
-            prompt,
-            **yaml.safe_load(
-                (
-                    Path(__file__).parent.parent
-                    / "prompts"
-                    / "suggest_shell_command.yml"
-                ).read_text()
-            ),
+            prompt, **self.__get_stage_options("suggest_shell_command", prompt)
         )
 
         return message.function_call.arguments
@@ -53,39 +173,149 @@ class ProviderOpenAI(ProviderAI):
 
         message = await self.__continue_conversation(
             f"{shell_command}\n\nIs this command safe to execute?",
-            **yaml.safe_load(
-                (
-                    Path(__file__).parent.parent
-                    / "prompts"
-                    / "recognise_dangerous_command.yml"
-                ).read_text()
+            **self.__get_stage_options(
+                "recognise_dangerous_command", shell_command
+            ),
+        )
+
+        return message.function_call.arguments
+
+    async def suggest_shell_commands(self, prompt: str, n: int) -> str:
+        """
+        Suggests `n` alternative shell commands based on the given prompt
+        in a single request. Returns JSON.
+        """
+
+        message = await self.__continue_conversation(
+            f"{prompt}\n\nSuggest {n} alternative shell commands.",
+            **self.__get_stage_options("suggest_shell_commands", prompt),
+        )
+
+        return message.function_call.arguments
+
+    async def recognise_dangerous_commands(
+        self, shell_commands: list[str]
+    ) -> str:
+        """
+        Checks if each of the shell commands is dangerous to run
+        in a single request. Returns JSON.
+        """
+
+        commands = "\n\n".join(
+            f"{i}. {shell_command}"
+            for i, shell_command in enumerate(shell_commands, start=1)
+        )
+
+        # The commands are checked independently of the conversation,
+        # so that several batches can be checked concurrently
+        message = await self.__create_chat_completion(
+            messages=[
+                self.__system_message,
+                self.__preferences,
+                {
+                    "role": "user",
+                    "content": f"{commands}\n\nIs each of these commands safe to execute?",
+                },
+            ],
+            **self.__get_stage_options(
+                "recognise_dangerous_commands", commands
             ),
         )
 
         return message.function_call.arguments
 
+    async def suggest_shell_command_with_analysis(self, prompt: str) -> Any:
+        """
+        Suggests a shell command based on the given prompt, recognises
+        whether it is dangerous and explains it in a single request.
+        """
+
+        options = self.__get_stage_options(
+            "suggest_shell_command_with_analysis", prompt
+        )
+
+        message = {"role": "user", "content": prompt}
+
+        stream = await self.__create_chat_completion(
+            messages=[self.__system_message, *self.__messages, message],
+            stream=True,
+            **options,
+        )
+
+        self.__messages.append(message)
+
+        return _AnalysisStream(stream, message)
+
+    async def get_shell_command_with_analysis_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        """
+        Helper function used to stream the JSON received by
+        the `suggest_shell_command_with_analysis` function.
+        """
+
+        arguments = ""
+        async for chunk in stream.stream:
+            if chunk.usage:
+                self.__record_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            function_call = chunk.choices[0].delta.function_call
+            if function_call and function_call.arguments:
+                arguments += function_call.arguments
+                yield function_call.arguments
+
+        message = {
+            "role": "assistant",
+            "content": None,
+            "function_call": {
+                "name": self.__prompts["suggest_shell_command_with_analysis"][
+                    "function_call"
+                ]["name"],
+                "arguments": arguments,
+            },
+        }
+        self.__messages.append(message)
+        stream.messages.append(message)
+
+    async def discard_shell_command_with_analysis(self, stream: Any) -> None:
+        """
+        Removes a failed `suggest_shell_command_with_analysis` request from
+        the conversation, so that the prompt can be sent again.
+        """
+
+        self.__messages[:] = [
+            message
+            for message in self.__messages
+            if not any(message is added for added in stream.messages)
+        ]
+
     async def get_explanation_of_shell_command(
         self, shell_command: str, *, model: Optional[str] = None
     ) -> Any:
         """Explains a shell command."""
 
-        prompt = yaml.safe_load(
-            (
-                Path(__file__).parent.parent
-                / "prompts"
-                / "explain_shell_command.yml"
-            ).read_text()
+        return await self.__stream_answer(
+            "explain_shell_command",
+            self.__explanation_prompt,
+            shell_command,
+            model=model,
         )
-        prompt["messages"][0]["content"] = prompt["messages"][0][
-            "content"
-        ].format(preferences=self.__preferences)
-        prompt["messages"].append({"role": "user", "content": shell_command})
 
-        stream = await self.__create_chat_completion(
-            model=model or self.__model, stream=True, **prompt
-        )
+    async def get_overview_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        """
+        Briefly describes how the parts of a shell command work together.
+        The result is streamed by `get_explanation_of_shell_command_by_chunks`.
+        """
 
-        return stream
+        return await self.__stream_answer(
+            "overview_of_shell_command",
+            self.__overview_prompt,
+            shell_command,
+            model=model,
+        )
 
     async def get_explanation_of_shell_command_by_chunks(
         self, stream: Any
@@ -96,26 +326,113 @@ class ProviderOpenAI(ProviderAI):
         """
 
         async for chunk in stream:
+            if chunk.usage:
+                self.__record_usage(chunk.usage)
+            if not chunk.choices:
+                continue
             content = chunk.choices[0].delta.content
             if content:
                 yield content
 
+    async def discard_explanation_of_shell_command(self, stream: Any) -> None:
+        """
+        Closes the result of `get_explanation_of_shell_command` that isn't
+        going to be streamed.
+        """
+
+        if isinstance(stream, AsyncStream):
+            await stream.close()
+        else:
+            await stream.aclose()
+
     async def edit_shell_command(self, shell_command: str, prompt: str) -> str:
         """Edits a shell command based on the given prompt. Returns JSON."""
 
         message = await self.__continue_conversation(
             f"{shell_command}\n\n{prompt}",
-            **yaml.safe_load(
-                (
-                    Path(__file__).parent.parent
-                    / "prompts"
-                    / "edit_shell_command.yml"
-                ).read_text()
+            **self.__get_stage_options(
+                "edit_shell_command", f"{shell_command}\n\n{prompt}"
             ),
         )
 
         return message.function_call.arguments
 
+    async def translate_shell_script(self, script: str, shell: str) -> str:
+        """
+        Translates a part of a shell script to the given shell
+        independently of the conversation. Returns JSON.
+        """
+
+        # Parts of a script are translated concurrently, so they don't
+        # continue the conversation
+        message = await self.__create_chat_completion(
+            messages=[
+                self.__system_message,
+                self.__preferences,
+                {
+                    "role": "user",
+                    "content": f"{script}\n\nTranslate this part of a shell script to {shell}.",
+                },
+            ],
+            **self.__get_stage_options("translate_shell_script", script),
+        )
+
+        return message.function_call.arguments
+
+    async def warm_up(self) -> None:
+        """
+        Opens a connection to the API, or keeps the pooled one alive,
+        by a request that doesn't use any tokens.
+        """
+
+        try:
+            await self.__client.with_options(max_retries=0).models.retrieve(
+                self.__model
+            )
+        except APIError as e:
+            # The connection is established even if the request fails
+            logger.debug("Warm-up request failed: %r", e)
+
+    async def __stream_answer(
+        self,
+        stage: str,
+        prompt: dict[str, Any],
+        shell_command: str,
+        *,
+        model: Optional[str] = None,
+    ) -> Any:
+        messages = [
+            self.__system_message,
+            *prompt["messages"],
+            self.__preferences,
+            {"role": "user", "content": shell_command},
+        ]
+
+        # An explicitly requested model is used as is
+        if not model and self.__classifier:
+            model = self.__classifier.choose(stage, shell_command)
+
+        stream = await self.__create_chat_completion(
+            messages=messages,
+            model=model or self.__model,
+            max_tokens=prompt.get("max_tokens"),
+            stream=True,
+            temperature=prompt.get("temperature"),
+        )
+
+        return stream
+
+    def __get_stage_options(self, stage: str, text: str) -> dict[str, Any]:
+        options = dict(self.__prompts[stage])
+
+        options["model"] = (
+            self.__classifier.choose(stage, text)
+            if self.__classifier
+            else self.__model
+        )
+
+        return options
+
     async def __continue_conversation(
         self,
         prompt: str,
@@ -127,10 +444,10 @@ class ProviderOpenAI(ProviderAI):
         response_format: Optional[dict[str, str]] = None,
         temperature: Optional[float] = None,
     ) -> Any:
-        self.__messages.append({"role": "user", "content": prompt})
+        user_message = {"role": "user", "content": prompt}
 
         message = await self.__create_chat_completion(
-            messages=self.__messages,
+            messages=[self.__system_message, *self.__messages, user_message],
             model=model or self.__model,
             function_call=function_call,
             functions=functions,
@@ -139,34 +456,101 @@ class ProviderOpenAI(ProviderAI):
             temperature=temperature,
         )
 
-        self.__messages.append(message)
+        self.__messages.extend((user_message, message))
 
         return message
 
     async def __create_chat_completion(
         self,
         *,
-        messages: list[dict[str, str]],
+        messages: list[Any],
         model: str,
-        function_call: Optional[dict[str, str]] = None,
+        function_call: Optional[Any] = None,
         functions: Optional[list[dict[str, Any]]] = None,
         max_tokens: Optional[int] = None,
         response_format: Optional[dict[str, str]] = None,
         stream: bool = False,
         temperature: Optional[float] = None,
     ) -> Any:
-        response = await self.__client.chat.completions.create(  # type: ignore
-            messages=messages,
-            model=model,
-            function_call=function_call,
-            functions=functions,
-            max_tokens=max_tokens,
-            response_format=response_format,
-            stream=stream,
-            temperature=temperature,
+        options: dict[str, Any] = {
+            "messages": messages,
+            "model": model,
+            "function_call": function_call,
+            "functions": functions,
+            "max_tokens": max_tokens,
+            "response_format": response_format,
+            "stream": stream,
+            "stream_options": {"include_usage": True} if stream else None,
+            "temperature": temperature,
+        }
+
+        if self.__single_flight is None:
+            response = await self.__client.chat.completions.create(**options)
+
+            if stream:
+                return response
+            else:
+                self.__record_usage(response.usage)
+                return response.choices[0].message
+
+        # The conversation is a part of the request, so only the requests
+        # made at the same point of identical conversations are shared
+        key = Cache.make_key(
+            str(self.__client.base_url),
+            json.dumps(
+                options,
+                sort_keys=True,
+                default=lambda value: value.model_dump(),
+            ),
         )
 
         if stream:
-            return response
+            chunks = await self.__single_flight.stream(
+                key, lambda: self.__request_chunks(options)
+            )
+            return _Chunks(
+                chunks,
+                ChatCompletionChunk.model_validate,
+                url=self.__client.base_url,
+            )
         else:
-            return response.choices[0].message
+            message = await self.__single_flight.run(
+                key, lambda: self.__request_message(options)
+            )
+            return ChatCompletionMessage.model_validate(message)
+
+    async def __request_message(self, options: dict[str, Any]) -> Any:
+        response = await self.__client.chat.completions.create(**options)
+
+        # The usage is only recorded by the caller that made the request
+        self.__record_usage(response.usage)
+
+        return response.choices[0].message.model_dump()
+
+    async def __request_chunks(
+        self, options: dict[str, Any]
+    ) -> AsyncIterator[Any]:
+        response = await self.__client.chat.completions.create(**options)
+
+        def dump(chunk: ChatCompletionChunk) -> Any:
+            if chunk.usage:
+                self.__record_usage(chunk.usage)
+            return chunk.model_dump(exclude={"usage"})
+
+        return _Chunks(response, dump, url=self.__client.base_url)
+
+    def __record_usage(self, usage: Any) -> None:
+        if not usage:
+            return
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+
+        self.prompt_tokens += usage.prompt_tokens
+        self.cached_tokens += cached_tokens
+
+        logger.debug(
+            "Prompt tokens: %d, cached tokens: %d",
+            usage.prompt_tokens,
+            cached_tokens,
+        )
@@ -0,0 +1,165 @@
+import asyncio
+from collections.abc import AsyncGenerator, Awaitable
+from typing import Any, Optional
+
+from shell_whiz.shell import ShellSyntaxError, parse
+
+from .api import ProviderAI
+from .wrapper import ProviderWrapper
+
+
+class _Segment:
+    """Explanation of a segment that is received in the background."""
+
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.started = asyncio.Event()
+        self.task: Optional["asyncio.Task[None]"] = None
+
+
+class _Explanation:
+    def __init__(self, segments: list[_Segment]) -> None:
+        self.segments = segments
+
+
+class ProviderParallelExplanations(ProviderWrapper):
+    """
+    Splits compound shell commands (pipelines, `&&` chains, etc.) into
+    segments and explains each of them by a concurrent request.
+    One more request gives a short overview of how the segments fit
+    together. The explanations are streamed in order, so the first
+    segment is rendered while the others are still being generated.
+    """
+
+    def __init__(self, api: ProviderAI, *, min_segments: int = 2) -> None:
+        super().__init__(api)
+        self.__min_segments = min_segments
+
+    async def get_explanation_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        """Explains a shell command."""
+
+        segments = self.__split(shell_command)
+        if len(segments) < self.__min_segments:
+            return await self._api.get_explanation_of_shell_command(
+                shell_command, model=model
+            )
+
+        explanation = _Explanation(
+            [
+                self.__start(
+                    self._api.get_explanation_of_shell_command(
+                        segment, model=model
+                    )
+                )
+                for segment in segments
+            ]
+            + [
+                self.__start(
+                    self._api.get_overview_of_shell_command(
+                        shell_command, model=model
+                    ),
+                    prefix="\n",
+                )
+            ]
+        )
+
+        # Make sure the caller waits until the first segment starts
+        await explanation.segments[0].started.wait()
+
+        return explanation
+
+    async def get_explanation_of_shell_command_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        """
+        Helper function used to stream the result received by
+        the `get_explanation_of_shell_command` function.
+        """
+
+        if not isinstance(stream, _Explanation):
+            async for (
+                chunk
+            ) in self._api.get_explanation_of_shell_command_by_chunks(stream):
+                yield chunk
+            return
+
+        try:
+            for segment in stream.segments:
+                while (chunk := await segment.queue.get()) is not None:
+                    yield chunk
+
+                # Propagate errors of the request, if any
+                if segment.task:
+                    await segment.task
+        finally:
+            for segment in stream.segments:
+                if segment.task:
+                    segment.task.cancel()
+
+    async def discard_explanation_of_shell_command(self, stream: Any) -> None:
+        """
+        Closes the result of `get_explanation_of_shell_command` that isn't
+        going to be streamed.
+        """
+
+        if not isinstance(stream, _Explanation):
+            await self._api.discard_explanation_of_shell_command(stream)
+            return
+
+        for segment in stream.segments:
+            if segment.task:
+                segment.task.cancel()
+
+    def __start(self, request: Awaitable[Any], prefix: str = "") -> _Segment:
+        segment = _Segment()
+        segment.task = asyncio.create_task(
+            self.__receive(request, segment, prefix)
+        )
+        return segment
+
+    async def __receive(
+        self, request: Awaitable[Any], segment: _Segment, prefix: str
+    ) -> None:
+        queue = segment.queue
+        try:
+            stream = await request
+
+            is_first_chunk = True
+            last_chunk = ""
+            try:
+                async for (
+                    chunk
+                ) in self._api.get_explanation_of_shell_command_by_chunks(
+                    stream
+                ):
+                    if is_first_chunk:
+                        if prefix:
+                            queue.put_nowait(prefix)
+                        segment.started.set()
+                        is_first_chunk = False
+                    queue.put_nowait(chunk)
+                    last_chunk = chunk
+            except asyncio.CancelledError:
+                # Nobody is going to read the rest of the explanation
+                await self._api.discard_explanation_of_shell_command(stream)
+                raise
+
+            if last_chunk and not last_chunk.endswith("\n"):
+                queue.put_nowait("\n")
+        finally:
+            queue.put_nowait(None)
+            segment.started.set()
+
+    def __split(self, shell_command: str) -> list[str]:
+        try:
+            command_list = parse(shell_command)
+        except ShellSyntaxError:
+            return [shell_command]
+
+        return [
+            command.text
+            for pipeline in command_list.pipelines
+            for command in pipeline.commands
+        ]
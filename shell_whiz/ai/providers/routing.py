@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import Any, Optional, TypeVar
+
+from shell_whiz.cache import read_json, write_json
+
+from .api import ProviderAI
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Backend:
+    """Rolling statistics of the recent requests sent to a backend."""
+
+    def __init__(self, name: str, api: ProviderAI, window: int) -> None:
+        self.name = name
+        self.api = api
+        # Latency of each request in seconds, None if it failed
+        self.results: deque[Optional[float]] = deque(maxlen=window)
+        self.failed_at = 0.0
+
+    def get_latency(self) -> float:
+        latencies = [result for result in self.results if result is not None]
+        # Backends without successful requests are tried first to learn
+        # their latency, unless they are known to fail
+        return sum(latencies) / len(latencies) if latencies else 0.0
+
+    def get_error_rate(self) -> float:
+        if not self.results:
+            return 0.0
+        return sum(result is None for result in self.results) / len(
+            self.results
+        )
+
+    def record(self, latency: Optional[float]) -> None:
+        self.results.append(latency)
+        if latency is None:
+            self.failed_at = time.time()
+
+
+class _RoutedStream:
+    def __init__(self, backend: _Backend, stream: Any) -> None:
+        self.backend = backend
+        self.stream = stream
+
+
+class ProviderRouter(ProviderAI):
+    """
+    Sends each request to the fastest healthy backend and fails over to
+    the next one on errors and timeouts. A backend is unhealthy while
+    more than `max_error_rate` of its recent requests have failed,
+    for `cooldown` seconds after the last failure.
+
+    The backends should share the conversation, so that a session can
+    continue on another backend. Streamed results are read from the
+    backend that started the stream. If `state_path` is given, the
+    statistics are kept there between runs.
+    """
+
+    def __init__(
+        self,
+        backends: list[tuple[str, ProviderAI]],
+        *,
+        timeout: float = 30.0,
+        window: int = 20,
+        max_error_rate: float = 0.5,
+        cooldown: float = 60.0,
+        state_path: Optional[str] = None,
+    ) -> None:
+        if not backends:
+            raise ValueError("At least one backend is required.")
+
+        self.__backends = [
+            _Backend(name, api, window) for name, api in backends
+        ]
+        self.__timeout = timeout
+        self.__max_error_rate = max_error_rate
+        self.__cooldown = cooldown
+        self.__state_path = state_path
+
+        self.__load_state()
+
+    async def suggest_shell_command(self, prompt: str) -> str:
+        """Suggests a shell command based on the given prompt. Returns JSON."""
+
+        _, result = await self.__route(
+            lambda api: api.suggest_shell_command(prompt)
+        )
+        return result
+
+    async def suggest_shell_commands(self, prompt: str, n: int) -> str:
+        """
+        Suggests `n` alternative shell commands based on the given prompt
+        in a single request. Returns JSON.
+        """
+
+        _, result = await self.__route(
+            lambda api: api.suggest_shell_commands(prompt, n)
+        )
+        return result
+
+    async def suggest_shell_command_with_analysis(self, prompt: str) -> Any:
+        """
+        Suggests a shell command based on the given prompt, recognises
+        whether it is dangerous and explains it in a single request.
+        """
+
+        backend, stream = await self.__route(
+            lambda api: api.suggest_shell_command_with_analysis(prompt)
+        )
+        return _RoutedStream(backend, stream)
+
+    async def get_shell_command_with_analysis_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        """
+        Helper function used to stream the JSON received by
+        the `suggest_shell_command_with_analysis` function.
+        """
+
+        async for (
+            chunk
+        ) in stream.backend.api.get_shell_command_with_analysis_by_chunks(
+            stream.stream
+        ):
+            yield chunk
+
+    async def discard_shell_command_with_analysis(self, stream: Any) -> None:
+        """
+        Removes a failed `suggest_shell_command_with_analysis` request from
+        the conversation, so that the prompt can be sent again.
+        """
+
+        await stream.backend.api.discard_shell_command_with_analysis(
+            stream.stream
+        )
+
+    async def recognise_dangerous_command(self, shell_command: str) -> str:
+        """Checks if a shell command is dangerous to run. Returns JSON."""
+
+        _, result = await self.__route(
+            lambda api: api.recognise_dangerous_command(shell_command)
+        )
+        return result
+
+    async def recognise_dangerous_commands(
+        self, shell_commands: list[str]
+    ) -> str:
+        """
+        Checks if each of the shell commands is dangerous to run
+        in a single request. Returns JSON.
+        """
+
+        _, result = await self.__route(
+            lambda api: api.recognise_dangerous_commands(shell_commands)
+        )
+        return result
+
+    async def get_explanation_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        """Explains a shell command."""
+
+        backend, stream = await self.__route(
+            lambda api: api.get_explanation_of_shell_command(
+                shell_command, model=model
+            )
+        )
+        return _RoutedStream(backend, stream)
+
+    async def get_overview_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        """
+        Briefly describes how the parts of a shell command work together.
+        The result is streamed by `get_explanation_of_shell_command_by_chunks`.
+        """
+
+        backend, stream = await self.__route(
+            lambda api: api.get_overview_of_shell_command(
+                shell_command, model=model
+            )
+        )
+        return _RoutedStream(backend, stream)
+
+    async def get_explanation_of_shell_command_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        """
+        Helper function used to stream the result received by
+        the `get_explanation_of_shell_command` function.
+        """
+
+        async for (
+            chunk
+        ) in stream.backend.api.get_explanation_of_shell_command_by_chunks(
+            stream.stream
+        ):
+            yield chunk
+
+    async def discard_explanation_of_shell_command(self, stream: Any) -> None:
+        """
+        Closes the result of `get_explanation_of_shell_command` that isn't
+        going to be streamed.
+        """
+
+        await stream.backend.api.discard_explanation_of_shell_command(
+            stream.stream
+        )
+
+    async def edit_shell_command(self, shell_command: str, prompt: str) -> str:
+        """Edits a shell command based on the given prompt. Returns JSON."""
+
+        _, result = await self.__route(
+            lambda api: api.edit_shell_command(shell_command, prompt)
+        )
+        return result
+
+    async def translate_shell_script(self, script: str, shell: str) -> str:
+        """
+        Translates a part of a shell script to the given shell
+        independently of the conversation. Returns JSON.
+        """
+
+        _, result = await self.__route(
+            lambda api: api.translate_shell_script(script, shell)
+        )
+        return result
+
+    async def warm_up(self) -> None:
+        """Prepares the backend that is going to get the next request."""
+
+        await self.__get_backends_in_order()[0].api.warm_up()
+
+    async def __route(
+        self, request: Callable[[ProviderAI], Awaitable[T]]
+    ) -> tuple[_Backend, T]:
+        error: Optional[Exception] = None
+
+        try:
+            for backend in self.__get_backends_in_order():
+                start = time.monotonic()
+                try:
+                    result = await asyncio.wait_for(
+                        request(backend.api), self.__timeout
+                    )
+                except Exception as e:
+                    logger.debug("Backend %s failed: %r", backend.name, e)
+                    backend.record(None)
+                    error = e
+                    continue
+
+                latency = time.monotonic() - start
+                logger.debug(
+                    "Backend %s responded in %.2fs", backend.name, latency
+                )
+                backend.record(latency)
+                return backend, result
+        finally:
+            self.__save_state()
+
+        assert error is not None
+        raise error
+
+    def __get_backends_in_order(self) -> list[_Backend]:
+        now = time.time()
+
+        def is_healthy(backend: _Backend) -> bool:
+            return (
+                backend.get_error_rate() <= self.__max_error_rate
+                or now - backend.failed_at > self.__cooldown
+            )
+
+        healthy = [
+            backend for backend in self.__backends if is_healthy(backend)
+        ]
+        unhealthy = [
+            backend for backend in self.__backends if not is_healthy(backend)
+        ]
+
+        # Unhealthy backends are still tried as a last resort, starting
+        # with the one that failed the longest time ago
+        return sorted(healthy, key=_Backend.get_latency) + sorted(
+            unhealthy, key=lambda backend: backend.failed_at
+        )
+
+    def __load_state(self) -> None:
+        if not self.__state_path:
+            return
+
+        state = read_json(self.__state_path)
+        if not isinstance(state, dict):
+            return
+
+        for backend in self.__backends:
+            entry = state.get(backend.name)
+            if not isinstance(entry, dict):
+                continue
+            backend.results.extend(
+                result
+                for result in entry.get("results", [])
+                if result is None or isinstance(result, (int, float))
+            )
+            if isinstance(entry.get("failed_at"), (int, float)):
+                backend.failed_at = entry["failed_at"]
+
+    def __save_state(self) -> None:
+        if not self.__state_path:
+            return
+
+        state = {
+            backend.name: {
+                "results": list(backend.results),
+                "failed_at": backend.failed_at,
+            }
+            for backend in self.__backends
+        }
+
+        write_json(self.__state_path, state)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import random
+from collections.abc import AsyncGenerator
+from typing import Any, Optional
+
+from .api import ProviderAI
+
+
+class ProviderStub(ProviderAI):
+    """
+    Local backend that always suggests the same shell command. Responses
+    are delayed by `latency` seconds and fail with `ConnectionError`
+    with the probability of `failure_rate`. It is used to try out
+    routing and other wrappers without network access.
+    """
+
+    def __init__(
+        self,
+        *,
+        shell_command: str = "echo 'Hello, world!'",
+        explanation: str = "- `echo` prints its arguments.\n",
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.__shell_command = shell_command
+        self.__explanation = explanation
+        self.__latency = latency
+        self.__failure_rate = failure_rate
+        self.__random = random.Random(seed)
+
+        self.requests = 0
+
+    async def suggest_shell_command(self, prompt: str) -> str:
+        await self.__respond()
+        return json.dumps({"shell_command": self.__shell_command})
+
+    async def suggest_shell_commands(self, prompt: str, n: int) -> str:
+        await self.__respond()
+        return json.dumps({"shell_commands": [self.__shell_command]})
+
+    async def suggest_shell_command_with_analysis(self, prompt: str) -> Any:
+        await self.__respond()
+        return json.dumps(
+            {
+                "shell_command": self.__shell_command,
+                "dangerous_to_run": False,
+                "explanation": self.__explanation,
+            }
+        )
+
+    async def get_shell_command_with_analysis_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        for i in range(0, len(stream), 16):
+            yield stream[i : i + 16]
+
+    async def recognise_dangerous_command(self, shell_command: str) -> str:
+        await self.__respond()
+        return json.dumps({"dangerous_to_run": False})
+
+    async def recognise_dangerous_commands(
+        self, shell_commands: list[str]
+    ) -> str:
+        await self.__respond()
+        return json.dumps(
+            {
+                "evaluations": [{"dangerous_to_run": False}]
+                * len(shell_commands)
+            }
+        )
+
+    async def get_explanation_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        await self.__respond()
+        return self.__explanation
+
+    async def get_overview_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        await self.__respond()
+        return ""
+
+    async def get_explanation_of_shell_command_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        for line in stream.splitlines(keepends=True):
+            yield line
+
+    async def edit_shell_command(self, shell_command: str, prompt: str) -> str:
+        await self.__respond()
+        return json.dumps({"shell_command": self.__shell_command})
+
+    async def translate_shell_script(self, script: str, shell: str) -> str:
+        await self.__respond()
+        return json.dumps({"shell_script": script})
+
+    async def __respond(self) -> None:
+        self.requests += 1
+
+        await asyncio.sleep(self.__latency)
+
+        if self.__random.random() < self.__failure_rate:
+            raise ConnectionError("Injected failure.")
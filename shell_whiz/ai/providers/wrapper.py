@@ -0,0 +1,76 @@
+from collections.abc import AsyncGenerator
+from typing import Any, Optional
+
+from .api import ProviderAI
+
+
+class ProviderWrapper(ProviderAI):
+    """
+    Helper class for providers that wrap another provider. Every request
+    is delegated to the wrapped provider unless overridden.
+    """
+
+    def __init__(self, api: ProviderAI) -> None:
+        self._api = api
+
+    async def suggest_shell_command(self, prompt: str) -> str:
+        return await self._api.suggest_shell_command(prompt)
+
+    async def suggest_shell_commands(self, prompt: str, n: int) -> str:
+        return await self._api.suggest_shell_commands(prompt, n)
+
+    async def suggest_shell_command_with_analysis(self, prompt: str) -> Any:
+        return await self._api.suggest_shell_command_with_analysis(prompt)
+
+    async def get_shell_command_with_analysis_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        async for chunk in self._api.get_shell_command_with_analysis_by_chunks(
+            stream
+        ):
+            yield chunk
+
+    async def discard_shell_command_with_analysis(self, stream: Any) -> None:
+        await self._api.discard_shell_command_with_analysis(stream)
+
+    async def recognise_dangerous_command(self, shell_command: str) -> str:
+        return await self._api.recognise_dangerous_command(shell_command)
+
+    async def recognise_dangerous_commands(
+        self, shell_commands: list[str]
+    ) -> str:
+        return await self._api.recognise_dangerous_commands(shell_commands)
+
+    async def get_explanation_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        return await self._api.get_explanation_of_shell_command(
+            shell_command, model=model
+        )
+
+    async def get_overview_of_shell_command(
+        self, shell_command: str, *, model: Optional[str] = None
+    ) -> Any:
+        return await self._api.get_overview_of_shell_command(
+            shell_command, model=model
+        )
+
+    async def get_explanation_of_shell_command_by_chunks(
+        self, stream: Any
+    ) -> AsyncGenerator[str, None]:
+        async for (
+            chunk
+        ) in self._api.get_explanation_of_shell_command_by_chunks(stream):
+            yield chunk
+
+    async def discard_explanation_of_shell_command(self, stream: Any) -> None:
+        await self._api.discard_explanation_of_shell_command(stream)
+
+    async def edit_shell_command(self, shell_command: str, prompt: str) -> str:
+        return await self._api.edit_shell_command(shell_command, prompt)
+
+    async def translate_shell_script(self, script: str, shell: str) -> str:
+        return await self._api.translate_shell_script(script, shell)
+
+    async def warm_up(self) -> None:
+        await self._api.warm_up()
@@ -0,0 +1,397 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable
+from typing import Any, Optional
+
+
+def _read_lock(lock_path: str) -> Optional[str]:
+    try:
+        with open(lock_path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _remove_lock(lock_path: str, name: str) -> None:
+    """Removes a lock unless it has been taken by another request since."""
+
+    if _read_lock(lock_path) == name:
+        _remove(lock_path)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def _close(items: AsyncIterable[Any]) -> None:
+    aclose = getattr(items, "aclose", None)
+    if aclose:
+        await aclose()
+
+
+class LeaderError(Exception):
+    """
+    The process making a request failed after some of its items have been
+    received, so the request can't be made again instead.
+    """
+
+
+class _LeaderError(Exception):
+    """The process making the request failed to share its result."""
+
+
+class _Flight:
+    """Items of a request shared by all callers waiting on it."""
+
+    def __init__(self) -> None:
+        self.items: list[Any] = []
+        self.is_done = False
+        self.error: Optional[BaseException] = None
+        self.condition = asyncio.Condition()
+        self.task: Optional["asyncio.Task[None]"] = None
+        self.subscribers = 0
+        self.is_abandoned = False
+
+    def unsubscribe(self) -> None:
+        self.subscribers -= 1
+
+        # Nobody is going to read the rest of the items
+        if not self.subscribers and not self.is_done and self.task:
+            self.is_abandoned = True
+            self.task.cancel()
+
+    async def put(self, item: Any) -> None:
+        async with self.condition:
+            self.items.append(item)
+            self.condition.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None) -> None:
+        async with self.condition:
+            self.is_done = True
+            self.error = error
+            self.condition.notify_all()
+
+
+class _Subscription:
+    """Items of a flight as they are received by one of its callers."""
+
+    def __init__(self, flight: _Flight) -> None:
+        self.__flight = flight
+        self.__position = 0
+        self.__is_closed = False
+
+        flight.subscribers += 1
+
+    def __aiter__(self) -> "_Subscription":
+        return self
+
+    async def __anext__(self) -> Any:
+        flight = self.__flight
+        if self.__is_closed:
+            raise StopAsyncIteration
+
+        try:
+            async with flight.condition:
+                await flight.condition.wait_for(
+                    lambda: len(flight.items) > self.__position
+                    or flight.is_done
+                )
+        except BaseException:
+            await self.aclose()
+            raise
+
+        if len(flight.items) > self.__position:
+            self.__position += 1
+            return flight.items[self.__position - 1]
+
+        await self.aclose()
+        if flight.error:
+            raise flight.error
+        raise StopAsyncIteration
+
+    async def aclose(self) -> None:
+        if not self.__is_closed:
+            self.__is_closed = True
+            self.__flight.unsubscribe()
+
+
+class SingleFlight:
+    """
+    Makes sure identical requests are only sent once at a time. Callers
+    of a request that is already in flight wait on its result instead,
+    and streamed results are passed on to all of them item by item.
+
+    If `directory` is given, requests are also shared between processes:
+    the first process takes a lock file and writes the items to a spool
+    file, which the other processes follow. Items must be JSON values.
+    The leader touches the lock while the request is in flight, and the
+    lock is considered stale if it isn't touched for `stale_after`
+    seconds. Spool files are removed once the request is finished,
+    followers that have opened them can still read them to the end.
+
+    A request is cancelled once all of its callers in the process close
+    their streams. Followers in other processes then get `LeaderError`,
+    unless they haven't received any items yet and make the request
+    themselves.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        *,
+        stale_after: float = 30.0,
+        poll_interval: float = 0.02,
+        spool_lifetime: float = 600.0,
+    ) -> None:
+        self.__directory = directory
+        self.__stale_after = stale_after
+        self.__poll_interval = poll_interval
+        self.__spool_lifetime = spool_lifetime
+
+        self.__flights: dict[str, _Flight] = {}
+
+    async def run(
+        self, key: str, request: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Returns the result of a request."""
+
+        async def get_items() -> AsyncIterable[Any]:
+            value = await request()
+
+            async def items() -> AsyncIterator[Any]:
+                yield value
+
+            return items()
+
+        subscription = await self.stream(key, get_items)
+        try:
+            async for item in subscription:
+                return item
+        finally:
+            await subscription.aclose()
+
+        raise _LeaderError("The request didn't return a result.")
+
+    async def stream(
+        self, key: str, request: Callable[[], Awaitable[AsyncIterable[Any]]]
+    ) -> _Subscription:
+        """
+        Returns the items of a streamed request once the first of them
+        is received. Errors of the request are raised right away if no
+        items have been received. The request is cancelled if all of its
+        callers close the returned streams before it is finished.
+        """
+
+        flight = self.__flights.get(key)
+        if flight is None or flight.is_abandoned:
+            flight = _Flight()
+            self.__flights[key] = flight
+            flight.task = asyncio.create_task(
+                self.__lead(key, flight, request)
+            )
+
+        subscription = _Subscription(flight)
+        try:
+            async with flight.condition:
+                await flight.condition.wait_for(
+                    lambda: bool(flight.items) or flight.is_done
+                )
+            if flight.error and not flight.items:
+                raise flight.error
+        except BaseException:
+            await subscription.aclose()
+            raise
+
+        return subscription
+
+    async def __lead(
+        self,
+        key: str,
+        flight: _Flight,
+        request: Callable[[], Awaitable[AsyncIterable[Any]]],
+    ) -> None:
+        try:
+            async for item in self.__produce(key, request):
+                await flight.put(item)
+        except BaseException as e:
+            await flight.finish(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            await flight.finish()
+        finally:
+            if self.__flights.get(key) is flight:
+                del self.__flights[key]
+
+    async def __produce(
+        self, key: str, request: Callable[[], Awaitable[AsyncIterable[Any]]]
+    ) -> AsyncIterator[Any]:
+        if not self.__directory:
+            async for item in self.__request(request):
+                yield item
+            return
+
+        lock_path = os.path.join(self.__directory, f"{key}.lock")
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+            fd = os.open(
+                lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600
+            )
+        except FileExistsError:
+            # Another process is making the same request
+            is_followed = False
+            try:
+                async for item in self.__follow(lock_path):
+                    is_followed = True
+                    yield item
+                return
+            except _LeaderError as e:
+                if is_followed:
+                    raise LeaderError(str(e))
+        except OSError:
+            pass
+        else:
+            async for item in self.__lead_processes(fd, lock_path, request):
+                yield item
+            return
+
+        async for item in self.__request(request):
+            yield item
+
+    async def __request(
+        self, request: Callable[[], Awaitable[AsyncIterable[Any]]]
+    ) -> AsyncIterator[Any]:
+        items = await request()
+        try:
+            async for item in items:
+                yield item
+        finally:
+            # E.g. the response is closed if the request is cancelled
+            await _close(items)
+
+    async def __lead_processes(
+        self,
+        fd: int,
+        lock_path: str,
+        request: Callable[[], Awaitable[AsyncIterable[Any]]],
+    ) -> AsyncIterator[Any]:
+        assert self.__directory is not None
+
+        self.__remove_old_spools()
+
+        spool_path = (
+            lock_path.removesuffix(".lock") + f".{uuid.uuid4().hex}.spool"
+        )
+        name = os.path.basename(spool_path)
+        heartbeat = None
+        try:
+            spool = open(spool_path, mode="w")
+            with os.fdopen(fd, mode="w") as lock:
+                lock.write(name)
+
+            heartbeat = asyncio.create_task(self.__beat(lock_path, name))
+
+            with spool:
+                try:
+                    async for item in self.__request(request):
+                        spool.write(json.dumps({"item": item}) + "\n")
+                        spool.flush()
+                        yield item
+                except BaseException as e:
+                    # Including cancellation, so followers don't wait
+                    spool.write(json.dumps({"error": repr(e)}) + "\n")
+                    raise
+                spool.write(json.dumps({"done": True}) + "\n")
+        finally:
+            if heartbeat:
+                heartbeat.cancel()
+            _remove_lock(lock_path, name)
+            _remove(spool_path)
+
+    async def __beat(self, lock_path: str, name: str) -> None:
+        """Shows that the request is still in flight, however slow."""
+
+        while True:
+            await asyncio.sleep(self.__stale_after / 3)
+            if _read_lock(lock_path) != name:
+                return
+            try:
+                os.utime(lock_path)
+            except OSError:
+                return
+
+    async def __follow(self, lock_path: str) -> AsyncIterator[Any]:
+        assert self.__directory is not None
+
+        spool = None
+        name = ""
+        line = ""
+        is_finished = False
+        try:
+            while True:
+                if spool is None:
+                    try:
+                        with open(lock_path) as f:
+                            name = f.read()
+                        if name:
+                            spool = open(os.path.join(self.__directory, name))
+                    except FileNotFoundError:
+                        # The request has already been finished
+                        raise _LeaderError("The lock has been released.")
+
+                try:
+                    lock_age = time.time() - os.stat(lock_path).st_mtime
+                except FileNotFoundError:
+                    lock_age = None
+
+                while spool is not None:
+                    line += spool.readline()
+                    if not line.endswith("\n"):
+                        break
+
+                    entry = json.loads(line)
+                    line = ""
+                    if "item" in entry:
+                        yield entry["item"]
+                    else:
+                        is_finished = True
+                        if entry.get("done"):
+                            return
+                        raise _LeaderError(entry.get("error", ""))
+
+                if lock_age is None:
+                    raise _LeaderError("The request has been abandoned.")
+                elif lock_age > self.__stale_after:
+                    _remove_lock(lock_path, name)
+                    is_finished = True
+                    raise _LeaderError("The lock is stale.")
+
+                await asyncio.sleep(self.__poll_interval)
+        finally:
+            if spool is not None:
+                spool.close()
+                # The leader fails to remove files that are open on Windows,
+                # and a stale one won't remove them at all
+                if is_finished:
+                    _remove(spool.name)
+
+    def __remove_old_spools(self) -> None:
+        assert self.__directory is not None
+
+        now = time.time()
+        try:
+            with os.scandir(self.__directory) as entries:
+                for entry in entries:
+                    if (
+                        entry.name.endswith(".spool")
+                        and now - entry.stat().st_mtime > self.__spool_lifetime
+                    ):
+                        os.remove(entry.path)
+        except OSError:
+            pass
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+from typing import Any
+
+
+def read_json(path: str) -> Any:
+    """Returns the value stored in a JSON file, or None if it is missing."""
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (os.error, json.JSONDecodeError):
+        return None
+
+
+def write_json(path: str, value: Any) -> bool:
+    """
+    Stores a value in a JSON file, replacing the file at once, so that it
+    is never left half-written. Returns whether the value has been stored.
+    """
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", mode="w") as f:
+            json.dump(value, f)
+        os.replace(path + ".tmp", path)
+    except os.error:
+        return False
+
+    return True
+
+
+class Cache:
+    """
+    Persistent key-value cache stored in a JSON file.
+    The least recently used entries are removed once there are more than
+    `max_entries` of them.
+    """
+
+    def __init__(self, path: str, *, max_entries: int = 10000) -> None:
+        self.__path = path
+        self.__max_entries = max_entries
+        self.__is_modified = False
+
+        entries = read_json(path)
+        self.__entries: dict[str, Any] = (
+            entries if isinstance(entries, dict) else {}
+        )
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Any:
+        if key not in self.__entries:
+            return None
+
+        # Mark the entry as recently used
+        value = self.__entries.pop(key)
+        self.__entries[key] = value
+        self.__is_modified = True
+
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.__entries.pop(key, None)
+        self.__entries[key] = value
+        self.__is_modified = True
+
+        while len(self.__entries) > self.__max_entries:
+            del self.__entries[next(iter(self.__entries))]
+
+    def save(self) -> None:
+        if self.__is_modified and write_json(self.__path, self.__entries):
+            self.__is_modified = False
@@ -1,11 +1,17 @@
 import typer
 
 from .commands.ask import ask
+from .commands.audit import audit
 from .commands.config import config
 from .commands.explain import explain
+from .commands.history import history
+from .commands.translate import translate
 
 cli = typer.Typer(help="Shell Whiz: AI assistant for the command line")
 
 cli.command()(ask)
+cli.command()(audit)
 cli.command()(config)
 cli.command()(explain)
+cli.command()(translate)
+cli.add_typer(history, name="history")
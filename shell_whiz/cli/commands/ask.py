@@ -1,5 +1,9 @@
 import asyncio
+import os
 import sys
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Annotated, Any, Optional
 
@@ -12,20 +16,53 @@ from rich.status import Status
 
 from shell_whiz.ai import (
     ClientAI,
+    ComplexityClassifier,
     EditingError,
-    ProviderOpenAI,
+    ErrorAI,
+    ExplanationParts,
     SuggestionError,
     WarningError,
 )
+from shell_whiz.cache import Cache
 from shell_whiz.config import Config, ConfigError
+from shell_whiz.history import History, HistoryEntry
+from shell_whiz.shell import ShellCommandValidator, rank_shell_commands
 
+from ..core.ai import AUTO_MODEL, create_ai, create_classifier
+from ..core.analysis import IncrementalAnalysis
+from ..core.history import open_history
 from ..core.shell_command import ShellCommand
 
+# The client keeps idle connections for 2 minutes, but servers may close
+# them sooner, so they are used every 30 seconds of a long wait, which
+# is limited to 10 requests
+_WARM_UP_INTERVAL = 30.0
+_MAX_WARM_UPS = 10
+
+
+async def _warm_up_later(ai: ClientAI) -> None:
+    for _ in range(_MAX_WARM_UPS):
+        await asyncio.sleep(_WARM_UP_INTERVAL)
+        await ai.warm_up()
+
+
+@asynccontextmanager
+async def _while_idle(ai: ClientAI) -> AsyncIterator[None]:
+    """
+    Keeps the connection to the API alive a while longer when waiting
+    for the user, so that the next request doesn't have to connect
+    again.
+    """
+
+    task = asyncio.create_task(_warm_up_later(ai))
+    try:
+        yield
+    finally:
+        task.cancel()
+        await asyncio.wait([task])
 
-async def _explain_shell_command(*, ai: ClientAI, coro: Any) -> None:
-    with Status("Wait, Shell Whiz is thinking..."):
-        stream = await coro
 
+async def _display_explanation(chunks: AsyncIterator[str]) -> str:
     rich.print(
         " ================== [bold green]Explanation[/] =================="
     )
@@ -33,9 +70,7 @@ async def _explain_shell_command(*, ai: ClientAI, coro: Any) -> None:
     is_first_chunk = True
     explanation = ""
     with Live(auto_refresh=False) as live:
-        async for chunk in ai.get_explanation_of_shell_command_by_chunks(
-            stream
-        ):
+        async for chunk in chunks:
             if is_first_chunk:
                 if not chunk.startswith("-"):
                     print()
@@ -45,13 +80,322 @@ async def _explain_shell_command(*, ai: ClientAI, coro: Any) -> None:
 
     print()
 
+    return explanation
+
+
+async def _explain_shell_command(*, ai: ClientAI, coro: Any) -> str:
+    with Status("Wait, Shell Whiz is thinking..."):
+        stream = await coro
+
+    return await _display_explanation(
+        ai.get_explanation_of_shell_command_by_chunks(stream)
+    )
+
+
+async def _recognise_dangerous_command(
+    *, ai: ClientAI, analysis: IncrementalAnalysis, shell_command: str
+) -> tuple[bool, str]:
+    """
+    Checks if a shell command is dangerous to run, unless a previous
+    revision of the command means exactly the same.
+    """
+
+    # Segments aren't checked on their own, as their danger depends on
+    # the rest of the command, e.g. `DIR=/; rm -rf "$DIR"`
+    verdict = analysis.get_verdict(shell_command)
+    if verdict is not None:
+        return verdict
+
+    return await ai.recognise_dangerous_command(shell_command)
+
+
+async def _request_explanation(
+    *, ai: ClientAI, analysis: IncrementalAnalysis, shell_command: str
+) -> AsyncIterator[str]:
+    """
+    Requests an explanation of a shell command, reusing the explanations
+    of the previous revisions of the command. Returns the chunks.
+    """
+
+    async def get_chunks(explanation: str) -> AsyncIterator[str]:
+        yield explanation
+
+    explanation = analysis.get_explanation(shell_command)
+    if explanation is not None:
+        return get_chunks(explanation)
+
+    segments = analysis.get_segment_explanations(shell_command)
+    if segments is None:
+        stream = await ai.get_explanation_of_shell_command(shell_command)
+        return ai.get_explanation_of_shell_command_by_chunks(stream)
+
+    # Only the segments that changed are explained, concurrently
+    parts = ExplanationParts(
+        [
+            (
+                explanation
+                if explanation is not None
+                else ai.get_explanation_of_shell_command(segment.text)
+            )
+            for segment, explanation in segments
+        ]
+    )
+    await parts.start()
+
+    def learn(i: int, explanation: str) -> None:
+        analysis.remember_segment(segments[i][0], explanation=explanation)
+
+    return parts.stream(
+        ai.get_explanation_of_shell_command_by_chunks, learn=learn
+    )
+
+
+async def _recall_shell_command(
+    *, history: History, prompt: str, quiet: bool
+) -> Optional[HistoryEntry]:
+    """Finds a shell command suggested for a similar prompt before."""
+
+    # The best match of each shell command, keeping the order of matches
+    matches: dict[str, HistoryEntry] = {}
+    for entry in history.search(prompt, limit=10):
+        matches.setdefault(entry.shell_command, entry)
+
+    entries = list(matches.values())[:5]
+
+    if not entries:
+        return None
+    elif quiet or len(entries) == 1:
+        return entries[0]
+
+    index = await questionary.select(
+        "Select a command from history",
+        [
+            questionary.Choice(
+                " ".join(entry.shell_command.splitlines())
+                + f"  ({entry.prompt})",
+                value=i,
+            )
+            for i, entry in enumerate(entries)
+        ]
+        + [questionary.Choice("None of these, ask Shell Whiz", value=-1)],
+    ).unsafe_ask_async()
+
+    return entries[index] if index >= 0 else None
+
+
+async def _display_entry(
+    *, entry: HistoryEntry, dont_warn: bool, dont_explain: bool
+) -> tuple[ShellCommand, bool, bool]:
+    """
+    Shows a shell command from history along with its warning and
+    explanation, if they are known. Returns the shell command and
+    whether it has been checked and explained.
+    """
+
+    async def get_explanation() -> AsyncIterator[str]:
+        yield entry.explanation
+
+    print()
+    shell_command = ShellCommand(entry.shell_command)
+    shell_command.display()
+
+    is_warned = False
+    if not dont_warn and entry.is_dangerous is not None:
+        shell_command.is_dangerous = entry.is_dangerous
+        shell_command.dangerous_consequences = entry.dangerous_consequences
+        shell_command.display_warning()
+        is_warned = True
+
+    is_explained = False
+    if not dont_explain and entry.explanation:
+        shell_command.explanation = await _display_explanation(
+            get_explanation()
+        )
+        is_explained = True
+
+    return shell_command, is_warned, is_explained
+
+
+def _save_to_history(
+    *,
+    history: History,
+    entry: Optional[HistoryEntry],
+    prompt: str,
+    shell_command: ShellCommand,
+    dont_warn: bool,
+) -> HistoryEntry:
+    if entry is None or entry.shell_command != shell_command.args:
+        entry = HistoryEntry(prompt=prompt, shell_command=shell_command.args)
+
+    if not dont_warn:
+        entry.is_dangerous = shell_command.is_dangerous
+        entry.dangerous_consequences = shell_command.dangerous_consequences
+    if shell_command.explanation:
+        entry.explanation = shell_command.explanation
+    entry.is_run = entry.is_run or shell_command.is_run
+    entry.time = time.time()
+
+    history.save(entry)
+
+    return entry
+
+
+async def _suggest_shell_command_with_analysis(
+    *, ai: ClientAI, prompt: str
+) -> tuple[Optional[ShellCommand], bool, bool]:
+    """
+    Suggests, checks and explains a shell command in a single request.
+    Returns the shell command (if any) and whether it has been checked and
+    explained, so that the missing parts can be requested separately.
+    """
+
+    shell_command = None
+    is_warned = False
+    is_explained = False
+
+    response = ai.suggest_shell_command_with_analysis(prompt)
+
+    status = Status("Wait, Shell Whiz is thinking...")
+    status.start()
+    try:
+        async for part, value in response:
+            if part == "shell_command":
+                status.stop()
+                print()
+                shell_command = ShellCommand(value)
+                shell_command.display()
+            elif part == "warning" and shell_command:
+                (
+                    shell_command.is_dangerous,
+                    shell_command.dangerous_consequences,
+                ) = value
+                shell_command.display_warning()
+                is_warned = True
+
+                shell_command.explanation = await _display_explanation(
+                    chunk
+                    async for part, chunk in response
+                    if part == "explanation"
+                )
+                # Only a complete explanation makes a separate one needless
+                is_explained = True
+    except ErrorAI:
+        pass
+    finally:
+        status.stop()
+
+    return shell_command, is_warned, is_explained
+
+
+async def _select_shell_command(
+    *, ai: ClientAI, prompt: str, n: int, dont_warn: bool, quiet: bool
+) -> tuple[ShellCommand, bool]:
+    """
+    Suggests several alternative shell commands in a single request,
+    checks all of them in another single request and lets the user pick
+    one of them. Returns the command and whether it has been checked.
+    """
+
+    with Status("Wait, Shell Whiz is thinking..."):
+        shell_commands = rank_shell_commands(
+            await ai.suggest_shell_commands(prompt, n)
+        )
+
+    warnings = [(False, "")] * len(shell_commands)
+    is_warned = False
+    if not dont_warn:
+        try:
+            with Status("Wait, Shell Whiz is thinking..."):
+                warnings = await ai.recognise_dangerous_commands(
+                    shell_commands
+                )
+        except WarningError:
+            # The selected command is checked on its own instead
+            pass
+        else:
+            is_warned = True
+
+    print()
+
+    if quiet or len(shell_commands) == 1:
+        index = 0
+    else:
+        index = await questionary.select(
+            "Select a command",
+            [
+                questionary.Choice(
+                    " ".join(args.splitlines())
+                    + (f"  (Warning: {consequences})" if is_dangerous else ""),
+                    value=i,
+                )
+                for i, (args, (is_dangerous, consequences)) in enumerate(
+                    zip(shell_commands, warnings)
+                )
+            ],
+        ).unsafe_ask_async()
+        print()
+
+    shell_command = ShellCommand(shell_commands[index])
+    shell_command.is_dangerous, shell_command.dangerous_consequences = (
+        warnings[index]
+    )
+
+    shell_command.display()
+    if is_warned:
+        shell_command.display_warning()
+
+    return shell_command, is_warned
+
+
+async def _validate_shell_command(
+    *,
+    ai: ClientAI,
+    validator: ShellCommandValidator,
+    shell_command: ShellCommand,
+    shell: Optional[Path],
+) -> None:
+    """
+    Checks a suggested shell command locally. If there are problems,
+    asks AI once to fix them before the command is shown.
+    """
+
+    # The shell that runs the command, see `ShellCommand.run`
+    shell_path = str(shell) if shell else "/bin/sh"
+
+    problems = await asyncio.to_thread(
+        validator.validate, shell_command.args, shell=shell_path
+    )
+    if not problems:
+        return
+
+    try:
+        args = await ai.edit_shell_command(
+            shell_command.args,
+            "Fix these problems:\n"
+            + "\n".join(f"- {problem}" for problem in problems),
+        )
+    except EditingError:
+        return
+
+    # Keep the original command unless the fix is better
+    fixed_problems = await asyncio.to_thread(
+        validator.validate, args, shell=shell_path
+    )
+    if len(fixed_problems) < len(problems):
+        shell_command.args = args
+
 
 async def _edit_shell_command(
-    *, ai: ClientAI, shell_command: ShellCommand
+    *,
+    ai: ClientAI,
+    shell_command: ShellCommand,
+    validator: Optional[ShellCommandValidator] = None,
+    shell: Optional[Path] = None,
 ) -> None:
-    prompt = await questionary.text(
-        "Enter your revision", validate=lambda x: x != ""
-    ).unsafe_ask_async()
+    async with _while_idle(ai):
+        prompt = await questionary.text(
+            "Enter your revision", validate=lambda x: x != ""
+        ).unsafe_ask_async()
 
     print()
     try:
@@ -59,12 +403,29 @@ async def _edit_shell_command(
             shell_command.args = await ai.edit_shell_command(
                 shell_command.args, prompt
             )
+            if validator:
+                await _validate_shell_command(
+                    ai=ai,
+                    validator=validator,
+                    shell_command=shell_command,
+                    shell=shell,
+                )
     except EditingError:
         rich.print(
             " Sorry, I couldn't edit the command. I left it unchanged.\n"
         )
 
 
+_OUTCOMES = {
+    "Run this command": "run",
+    "Explain this command": "explained",
+    "Explain using GPT-4o": "escalated",
+    "Revise query": "revised",
+    "Edit manually": "edited",
+    "Exit": "exit",
+}
+
+
 async def _perform_selected_action(
     *,
     ai: ClientAI,
@@ -72,37 +433,71 @@ async def _perform_selected_action(
     actions: list[str],
     shell: Optional[Path] = None,
     output_file: Optional[Path] = None,
+    classifier: Optional[ComplexityClassifier] = None,
+    prefetch: bool = False,
+    validator: Optional[ShellCommandValidator] = None,
 ) -> None:
-    while True:
-        action = await questionary.select(
-            "Select an action", actions
-        ).unsafe_ask_async()
+    explanation_task = None
+    if prefetch and "Explain this command" in actions:
+        explanation_task = asyncio.create_task(
+            ai.get_explanation_of_shell_command(shell_command.args)
+        )
 
-        if action == "Exit":
-            raise typer.Exit(1)
-        elif action == "Run this command":
-            await shell_command.run(shell=shell, output_file=output_file)
-        elif action == "Explain this command":
-            print()
-            await _explain_shell_command(
-                ai=ai,
-                coro=ai.get_explanation_of_shell_command(shell_command.args),
-            )
-        elif action == "Explain using GPT-4o":
-            print()
-            await _explain_shell_command(
-                ai=ai,
-                coro=ai.get_explanation_of_shell_command(
-                    shell_command.args, model="gpt-4o"
-                ),
-            )
-        elif action == "Revise query":
-            await _edit_shell_command(ai=ai, shell_command=shell_command)
-            return
-        elif action == "Edit manually":
-            await shell_command.edit_manually()
-            print()
-            return
+    try:
+        while True:
+            async with _while_idle(ai):
+                action = await questionary.select(
+                    "Select an action", actions
+                ).unsafe_ask_async()
+
+            if classifier:
+                classifier.record_outcome(_OUTCOMES[action])
+
+            if action == "Exit":
+                raise typer.Exit(1)
+            elif action == "Run this command":
+                await shell_command.run(shell=shell, output_file=output_file)
+            elif action == "Explain this command":
+                print()
+                shell_command.explanation = await _explain_shell_command(
+                    ai=ai,
+                    coro=explanation_task
+                    or ai.get_explanation_of_shell_command(shell_command.args),
+                )
+                explanation_task = None
+            elif action == "Explain using GPT-4o":
+                print()
+                shell_command.explanation = await _explain_shell_command(
+                    ai=ai,
+                    coro=ai.get_explanation_of_shell_command(
+                        shell_command.args, model="gpt-4o"
+                    ),
+                )
+            elif action == "Revise query":
+                await _edit_shell_command(
+                    ai=ai,
+                    shell_command=shell_command,
+                    validator=validator,
+                    shell=shell,
+                )
+                return
+            elif action == "Edit manually":
+                async with _while_idle(ai):
+                    await shell_command.edit_manually()
+                print()
+                return
+    finally:
+        if explanation_task:
+            if not explanation_task.done():
+                explanation_task.cancel()
+            elif (
+                not explanation_task.cancelled()
+                and explanation_task.exception() is None
+            ):
+                # The response is still being received
+                await ai.discard_explanation_of_shell_command(
+                    explanation_task.result()
+                )
 
 
 async def _run(
@@ -112,60 +507,178 @@ async def _run(
     dont_warn: bool,
     dont_explain: bool,
     quiet: bool,
+    combined: bool,
+    candidates: int,
     actions: list[str],
     shell: Path | None,
     output_file: Path | None,
+    classifier: Optional[ComplexityClassifier] = None,
+    prefetch: bool = False,
+    history: Optional[History] = None,
+    save_history: bool = True,
+    from_history: bool = False,
+    validator: Optional[ShellCommandValidator] = None,
 ) -> None:
-    try:
-        with Status("Wait, Shell Whiz is thinking..."):
-            shell_command = ShellCommand(
-                await ai.suggest_shell_command(" ".join(prompt))
+    shell_command = None
+    is_warned = False
+    is_explained = False
+
+    entry = None
+    if history and from_history:
+        entry = await _recall_shell_command(
+            history=history, prompt=" ".join(prompt), quiet=quiet
+        )
+
+    if entry:
+        shell_command, is_warned, is_explained = await _display_entry(
+            entry=entry, dont_warn=dont_warn, dont_explain=dont_explain
+        )
+    elif candidates > 1:
+        try:
+            shell_command, is_warned = await _select_shell_command(
+                ai=ai,
+                prompt=" ".join(prompt),
+                n=candidates,
+                dont_warn=dont_warn,
+                quiet=quiet,
+            )
+        except SuggestionError:
+            pass
+    elif combined and not (dont_warn or dont_explain):
+        shell_command, is_warned, is_explained = (
+            await _suggest_shell_command_with_analysis(
+                ai=ai, prompt=" ".join(prompt)
             )
-    except SuggestionError:
-        rich.print(
-            "[bold yellow]Error[/]: Sorry, I don't know how to do this.",
-            file=sys.stderr,
         )
-        raise typer.Exit(1)
-    else:
-        print()
 
-    while True:
-        shell_command.display()
+    is_displayed = shell_command is not None
 
-        if not dont_explain:
-            explanation_task = asyncio.create_task(
-                ai.get_explanation_of_shell_command(shell_command.args)
+    if shell_command is None:
+        try:
+            with Status("Wait, Shell Whiz is thinking..."):
+                shell_command = ShellCommand(
+                    await ai.suggest_shell_command(" ".join(prompt))
+                )
+                if validator:
+                    await _validate_shell_command(
+                        ai=ai,
+                        validator=validator,
+                        shell_command=shell_command,
+                        shell=shell,
+                    )
+        except SuggestionError:
+            if classifier:
+                classifier.record_outcome("failed")
+            rich.print(
+                "[bold yellow]Error[/]: Sorry, I don't know how to do this.",
+                file=sys.stderr,
             )
+            raise typer.Exit(1)
+        else:
+            print()
+
+    # Revisions of the command only have their changes analysed again
+    analysis = IncrementalAnalysis()
 
-        if not dont_warn:
-            try:
+    try:
+        while True:
+            if not is_displayed:
+                shell_command.display()
+
+            if not dont_explain and not is_explained:
+                explanation_task = asyncio.create_task(
+                    _request_explanation(
+                        ai=ai,
+                        analysis=analysis,
+                        shell_command=shell_command.args,
+                    )
+                )
+
+            is_checked = is_warned and not dont_warn
+            if not dont_warn and not is_warned:
+                try:
+                    with Status("Wait, Shell Whiz is thinking..."):
+                        (
+                            shell_command.is_dangerous,
+                            shell_command.dangerous_consequences,
+                        ) = await _recognise_dangerous_command(
+                            ai=ai,
+                            analysis=analysis,
+                            shell_command=shell_command.args,
+                        )
+                except WarningError:
+                    shell_command.is_dangerous = False
+                else:
+                    is_checked = True
+
+                shell_command.display_warning()
+
+            if not dont_explain and not is_explained:
                 with Status("Wait, Shell Whiz is thinking..."):
+                    chunks = await explanation_task
+                shell_command.explanation = await _display_explanation(chunks)
+
+            analysis.remember(
+                shell_command.args,
+                verdict=(
                     (
                         shell_command.is_dangerous,
                         shell_command.dangerous_consequences,
-                    ) = await ai.recognise_dangerous_command(
-                        shell_command.args
                     )
-            except WarningError:
-                shell_command.is_dangerous = False
+                    if is_checked
+                    else None
+                ),
+                explanation=shell_command.explanation,
+            )
 
-        if not dont_warn:
-            shell_command.display_warning()
+            if history and save_history:
+                entry = _save_to_history(
+                    history=history,
+                    entry=entry,
+                    prompt=" ".join(prompt),
+                    shell_command=shell_command,
+                    dont_warn=dont_warn,
+                )
 
-        if not dont_explain:
-            await _explain_shell_command(ai=ai, coro=explanation_task)
+            if quiet:
+                break
 
-        if quiet:
-            break
+            args = shell_command.args
+            await _perform_selected_action(
+                ai=ai,
+                shell_command=shell_command,
+                actions=actions,
+                shell=shell,
+                output_file=output_file,
+                classifier=classifier,
+                prefetch=prefetch,
+                validator=validator,
+            )
 
-        await _perform_selected_action(
-            ai=ai,
-            shell_command=shell_command,
-            actions=actions,
-            shell=shell,
-            output_file=output_file,
-        )
+            # The command has been revised, so the explanation, if any,
+            # belongs to the previous one
+            analysis.remember(args, explanation=shell_command.explanation)
+            if (
+                history
+                and save_history
+                and entry
+                and shell_command.explanation
+            ):
+                entry.explanation = shell_command.explanation
+                history.save(entry)
+            shell_command.explanation = ""
+
+            is_displayed = is_warned = is_explained = False
+    finally:
+        # Remember whether the command has been run
+        if history and save_history and entry:
+            _save_to_history(
+                history=history,
+                entry=entry,
+                prompt=" ".join(prompt),
+                shell_command=shell_command,
+                dont_warn=dont_warn,
+            )
 
 
 def _get_actions(*, dont_explain: bool, model: str) -> list[str]:
@@ -196,8 +709,31 @@ def ask(
         ),
     ] = "I use Bash on Linux",
     model: Annotated[
-        str, typer.Option("-m", "--model", help="AI model to use.")
+        str,
+        typer.Option(
+            "-m",
+            "--model",
+            help=f"AI model to use. Use '{AUTO_MODEL}' to pick the model of each request by its complexity.",
+        ),
     ] = "gpt-4o-mini",
+    cache: Annotated[
+        bool,
+        typer.Option(
+            help="Explain known programs and flags locally, requesting explanations only for the rest."
+        ),
+    ] = True,
+    parallel: Annotated[
+        bool,
+        typer.Option(
+            help="Explain each part of a pipeline or a chain of commands by a separate concurrent request."
+        ),
+    ] = False,
+    environment: Annotated[
+        bool,
+        typer.Option(
+            help="Tell AI which OS and shell you use and which programs are installed."
+        ),
+    ] = True,
     dont_warn: Annotated[
         bool, typer.Option(help="Skip the warning part.")
     ] = False,
@@ -215,6 +751,47 @@ def ask(
             "-q", "--quiet/--no-quiet", help="Skip the interactive part."
         ),
     ] = False,
+    prefetch: Annotated[
+        bool,
+        typer.Option(
+            help="With --dont-explain, request the explanation in the background while you choose an action, so that it's ready if you ask for it."
+        ),
+    ] = False,
+    save_history: Annotated[
+        bool,
+        typer.Option(
+            "--history/--no-history",
+            help="Save suggested commands to the local history.",
+        ),
+    ] = True,
+    from_history: Annotated[
+        bool,
+        typer.Option(
+            help="Recall a command suggested for a similar query from the local history instead of asking AI."
+        ),
+    ] = False,
+    validate: Annotated[
+        bool,
+        typer.Option(
+            help="Check the syntax, programs and flags of the suggested command locally and have it fixed before it is shown."
+        ),
+    ] = True,
+    combined: Annotated[
+        bool,
+        typer.Option(
+            help="Suggest, warn and explain in a single request. Falls back to separate requests if the response can't be parsed."
+        ),
+    ] = False,
+    candidates: Annotated[
+        int,
+        typer.Option(
+            "-c",
+            "--candidates",
+            help="Number of alternative commands to choose from. They are suggested and checked for danger in a single request each.",
+            min=1,
+            max=10,
+        ),
+    ] = 1,
     shell: Annotated[
         Optional[Path],
         typer.Option(
@@ -248,22 +825,51 @@ def ask(
         )
         raise typer.Exit(1)
 
-    asyncio.run(
-        _run(
-            ai=ClientAI(
-                ProviderOpenAI(
-                    api_key=config.openai_api_key,
-                    organization=config.openai_org_id,
+    classifier = create_classifier() if model == AUTO_MODEL else None
+    history = open_history() if save_history or from_history else None
+
+    validator = None
+    if validate:
+        try:
+            validator = ShellCommandValidator(
+                Cache(os.path.join(Config.get_directory(), "validation.json"))
+            )
+        except ConfigError:
+            validator = ShellCommandValidator()
+
+    try:
+        asyncio.run(
+            _run(
+                ai=create_ai(
+                    config=config,
                     model=model,
                     preferences=preferences,
-                )
-            ),
-            prompt=prompt,
-            dont_warn=dont_warn,
-            dont_explain=dont_explain,
-            quiet=quiet,
-            actions=_get_actions(dont_explain=dont_explain, model=model),
-            shell=shell,
-            output_file=output_file,
+                    cache=cache,
+                    parallel=parallel,
+                    classifier=classifier,
+                    environment=environment,
+                ),
+                prompt=prompt,
+                dont_warn=dont_warn,
+                dont_explain=dont_explain,
+                quiet=quiet,
+                combined=combined,
+                candidates=candidates,
+                actions=_get_actions(dont_explain=dont_explain, model=model),
+                shell=shell,
+                output_file=output_file,
+                classifier=classifier,
+                prefetch=prefetch,
+                history=history,
+                save_history=save_history,
+                from_history=from_history,
+                validator=validator,
+            )
         )
-    )
+    finally:
+        if history:
+            history.close()
+        if validator:
+            validator.save()
+        if classifier:
+            classifier.close()
@@ -0,0 +1,340 @@
+import asyncio
+import json
+import os
+import sys
+from enum import Enum
+from pathlib import Path
+from typing import Annotated, Any, Optional
+
+import rich
+import typer
+from rich.status import Status
+
+from shell_whiz.ai import ClientAI, WarningError
+from shell_whiz.cache import Cache
+from shell_whiz.config import Config, ConfigError
+from shell_whiz.shell import ScriptCommand, split_script
+
+from ..core.ai import AUTO_MODEL, create_ai, create_classifier
+from ..core.errors import API_ERRORS, report_api_error
+
+
+class OutputFormat(str, Enum):
+    text = "text"
+    json = "json"
+    sarif = "sarif"
+
+
+def _estimate_tokens(shell_command: str) -> int:
+    # About 4 characters per token, plus numbering and the evaluation
+    return len(shell_command) // 4 + 24
+
+
+def _make_batches(
+    commands: list[ScriptCommand], *, max_tokens: int, max_commands: int = 50
+) -> list[list[ScriptCommand]]:
+    batches: list[list[ScriptCommand]] = []
+
+    tokens = 0
+    for command in commands:
+        command_tokens = _estimate_tokens(command.text)
+        if (
+            not batches
+            or tokens + command_tokens > max_tokens
+            or len(batches[-1]) >= max_commands
+        ):
+            batches.append([])
+            tokens = 0
+        batches[-1].append(command)
+        tokens += command_tokens
+
+    return batches
+
+
+async def _check_batch(
+    *, ai: ClientAI, batch: list[ScriptCommand], semaphore: asyncio.Semaphore
+) -> list[Optional[tuple[bool, str]]]:
+    async with semaphore:
+        try:
+            return list(
+                await ai.recognise_dangerous_commands(
+                    [command.text for command in batch]
+                )
+            )
+        except WarningError:
+            if len(batch) == 1:
+                return [None]
+
+    # Split the batch to isolate the commands that fail to be checked
+    middle = len(batch) // 2
+    first, second = await asyncio.gather(
+        _check_batch(ai=ai, batch=batch[:middle], semaphore=semaphore),
+        _check_batch(ai=ai, batch=batch[middle:], semaphore=semaphore),
+    )
+    return first + second
+
+
+def _get_sarif(
+    findings: list[dict[str, Any]], errors: list[dict[str, Any]]
+) -> dict[str, Any]:
+    return {
+        "version": "2.1.0",
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "runs": [
+            {
+                "tool": {
+                    "driver": {
+                        "name": "Shell Whiz",
+                        "informationUri": "https://github.com/beyimjan/shell-whiz",
+                        "rules": [
+                            {
+                                "id": "dangerous-command",
+                                "shortDescription": {
+                                    "text": "Dangerous shell command"
+                                },
+                            },
+                            {
+                                "id": "unchecked-command",
+                                "shortDescription": {
+                                    "text": "Shell command that couldn't be checked"
+                                },
+                            },
+                        ],
+                    }
+                },
+                "results": [
+                    {
+                        "ruleId": rule_id,
+                        "level": level,
+                        "message": {"text": result["message"]},
+                        "locations": [
+                            {
+                                "physicalLocation": {
+                                    "artifactLocation": {
+                                        "uri": result["file"]
+                                    },
+                                    "region": {
+                                        "startLine": result["line"],
+                                        "endLine": result["end_line"],
+                                    },
+                                }
+                            }
+                        ],
+                    }
+                    for rule_id, level, results in (
+                        ("dangerous-command", "error", findings),
+                        ("unchecked-command", "warning", errors),
+                    )
+                    for result in results
+                ],
+            }
+        ],
+    }
+
+
+def _print_report(
+    findings: list[dict[str, Any]],
+    errors: list[dict[str, Any]],
+    output_format: OutputFormat,
+) -> None:
+    if output_format == OutputFormat.json:
+        print(json.dumps({"findings": findings, "errors": errors}, indent=2))
+    elif output_format == OutputFormat.sarif:
+        print(json.dumps(_get_sarif(findings, errors), indent=2))
+    else:
+        for finding in findings:
+            rich.print(
+                f"{finding['file']}:{finding['line']}: [bold red]Warning[/]: [bold yellow]{finding['message']}[/]"
+            )
+            print("    " + finding["command"].strip().splitlines()[0])
+        for error in errors:
+            rich.print(
+                f"{error['file']}:{error['line']}: [bold yellow]Error[/]: {error['message']}",
+                file=sys.stderr,
+            )
+        if not findings and not errors:
+            rich.print("No dangerous commands found.")
+
+
+async def _run(
+    *,
+    ai: ClientAI,
+    files: list[Path],
+    model: str,
+    preferences: str,
+    output_format: OutputFormat,
+    batch_tokens: int,
+    jobs: int,
+    cache: Optional[Cache],
+) -> int:
+    scripts = {}
+    for file in files:
+        try:
+            scripts[file] = split_script(file.read_text())
+        except (os.error, UnicodeDecodeError):
+            rich.print(
+                f"[bold yellow]Error[/]: Failed to read {file}.",
+                file=sys.stderr,
+            )
+            raise typer.Exit(2)
+
+    # Commands are checked once per unique text and the verdicts are cached
+    verdicts: dict[str, Optional[tuple[bool, str]]] = {}
+    unchecked: dict[str, ScriptCommand] = {}
+    for commands in scripts.values():
+        for command in commands:
+            cached = (
+                cache.get(Cache.make_key(model, preferences, command.text))
+                if cache
+                else None
+            )
+            if cached is not None:
+                verdicts[command.text] = (cached[0], cached[1])
+            else:
+                unchecked.setdefault(command.text, command)
+
+    batches = _make_batches(list(unchecked.values()), max_tokens=batch_tokens)
+
+    if batches:
+        semaphore = asyncio.Semaphore(jobs)
+        with Status(
+            f"Wait, Shell Whiz is checking {len(unchecked)} commands..."
+        ):
+            results = await asyncio.gather(
+                *(
+                    _check_batch(ai=ai, batch=batch, semaphore=semaphore)
+                    for batch in batches
+                )
+            )
+
+        for batch, result in zip(batches, results):
+            for command, verdict in zip(batch, result):
+                verdicts[command.text] = verdict
+                if cache and verdict is not None:
+                    cache.set(
+                        Cache.make_key(model, preferences, command.text),
+                        verdict,
+                    )
+
+    if cache:
+        cache.save()
+
+    findings = []
+    errors = []
+    for file, commands in scripts.items():
+        for command in commands:
+            verdict = verdicts[command.text]
+            location = {
+                "file": file.as_posix(),
+                "line": command.line,
+                "end_line": command.end_line,
+                "command": command.text,
+            }
+            if verdict is None:
+                errors.append(
+                    location | {"message": "Failed to check the command."}
+                )
+            elif verdict[0]:
+                findings.append(location | {"message": verdict[1]})
+
+    _print_report(findings, errors, output_format)
+
+    if findings:
+        return 1
+    elif errors:
+        return 2
+    else:
+        return 0
+
+
+def audit(
+    files: Annotated[
+        list[Path],
+        typer.Argument(
+            exists=True, dir_okay=False, readable=True, show_default=False
+        ),
+    ],
+    preferences: Annotated[
+        str,
+        typer.Option(
+            "-p", "--preferences", help="Preferences for the AI assistant."
+        ),
+    ] = "I use Bash on Linux",
+    model: Annotated[
+        str,
+        typer.Option(
+            "-m",
+            "--model",
+            help=f"AI model to use. Use '{AUTO_MODEL}' to pick the model of each request by its complexity.",
+        ),
+    ] = "gpt-4o-mini",
+    output_format: Annotated[
+        OutputFormat, typer.Option("-f", "--format", help="Output format.")
+    ] = OutputFormat.text,
+    batch_tokens: Annotated[
+        int,
+        typer.Option(
+            help="Approximate number of tokens of commands checked by a single request.",
+            min=256,
+        ),
+    ] = 2048,
+    jobs: Annotated[
+        int,
+        typer.Option(
+            "-j", "--jobs", help="Number of concurrent requests.", min=1
+        ),
+    ] = 4,
+    cache: Annotated[
+        bool, typer.Option(help="Reuse the results for unchanged commands.")
+    ] = True,
+) -> None:
+    """Check shell scripts for dangerous commands"""
+
+    try:
+        config = Config()
+    except ConfigError:
+        rich.print(
+            "[bold yellow]Error[/]: Please set your OpenAI API key via [bold green]sw config[/] and try again.",
+            file=sys.stderr,
+        )
+        raise typer.Exit(2)
+
+    audit_cache = None
+    if cache:
+        try:
+            audit_cache = Cache(
+                os.path.join(Config.get_directory(), "audit.json")
+            )
+        except ConfigError:
+            pass
+
+    classifier = create_classifier() if model == AUTO_MODEL else None
+
+    try:
+        exit_code = asyncio.run(
+            _run(
+                ai=create_ai(
+                    config=config,
+                    model=model,
+                    preferences=preferences,
+                    cache=False,
+                    classifier=classifier,
+                ),
+                files=files,
+                model=model,
+                preferences=preferences,
+                output_format=output_format,
+                batch_tokens=batch_tokens,
+                jobs=jobs,
+                cache=audit_cache,
+            )
+        )
+    except API_ERRORS as error:
+        # Errors are told apart from dangerous commands by the exit code
+        report_api_error(error)
+        raise typer.Exit(2)
+    finally:
+        if classifier:
+            classifier.close()
+
+    raise typer.Exit(exit_code)
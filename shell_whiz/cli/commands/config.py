@@ -28,9 +28,19 @@ def config() -> None:
         "Organization ID", default=os.environ.get("OPENAI_ORG_ID", "")
     ).unsafe_ask()
 
+    # Keep the settings that can only be changed in the file
+    try:
+        current_config = Config()
+        backends, timeout = current_config.backends, current_config.timeout
+    except ConfigError:
+        backends, timeout = None, None
+
     try:
         config = ConfigModel(
-            openai_api_key=openai_api_key, openai_org_id=openai_org_id or None
+            openai_api_key=openai_api_key,
+            openai_org_id=openai_org_id or None,
+            backends=backends,
+            timeout=timeout,
         )
     except pydantic.ValidationError:
         rich.print(
@@ -8,9 +8,11 @@ from rich.live import Live
 from rich.markdown import Markdown
 from rich.status import Status
 
-from shell_whiz.ai import ClientAI, ProviderOpenAI
+from shell_whiz.ai import ClientAI
 from shell_whiz.config import Config, ConfigError
 
+from ..core.ai import AUTO_MODEL, create_ai, create_classifier
+
 
 async def _run(ai: ClientAI, shell_command: str) -> None:
     with Status("Wait, Shell Whiz is thinking..."):
@@ -41,8 +43,31 @@ def explain(
         ),
     ] = "I use Bash on Linux",
     model: Annotated[
-        str, typer.Option("-m", "--model", help="AI model to use.")
+        str,
+        typer.Option(
+            "-m",
+            "--model",
+            help=f"AI model to use. Use '{AUTO_MODEL}' to pick the model of each request by its complexity.",
+        ),
     ] = "gpt-4o-mini",
+    cache: Annotated[
+        bool,
+        typer.Option(
+            help="Explain known programs and flags locally, requesting explanations only for the rest."
+        ),
+    ] = True,
+    parallel: Annotated[
+        bool,
+        typer.Option(
+            help="Explain each part of a pipeline or a chain of commands by a separate concurrent request."
+        ),
+    ] = False,
+    environment: Annotated[
+        bool,
+        typer.Option(
+            help="Tell AI which OS and shell you use and which programs are installed."
+        ),
+    ] = True,
 ) -> None:
     """Explain a shell command"""
 
@@ -55,16 +80,23 @@ def explain(
         )
         raise typer.Exit(1)
 
-    asyncio.run(
-        _run(
-            ai=ClientAI(
-                ProviderOpenAI(
-                    api_key=config.openai_api_key,
-                    organization=config.openai_org_id,
+    classifier = create_classifier() if model == AUTO_MODEL else None
+
+    try:
+        asyncio.run(
+            _run(
+                ai=create_ai(
+                    config=config,
                     model=model,
                     preferences=preferences,
-                )
-            ),
-            shell_command=prompt,
+                    cache=cache,
+                    parallel=parallel,
+                    classifier=classifier,
+                    environment=environment,
+                ),
+                shell_command=prompt,
+            )
         )
-    )
+    finally:
+        if classifier:
+            classifier.close()
@@ -0,0 +1,51 @@
+import sys
+from datetime import datetime
+from typing import Annotated
+
+import rich
+import typer
+from rich.markup import escape
+
+from ..core.history import open_history
+
+history = typer.Typer(help="Search previously suggested commands")
+
+
+@history.command()
+def search(
+    terms: Annotated[list[str], typer.Argument(show_default=False)],
+    limit: Annotated[
+        int,
+        typer.Option(
+            "-n", "--limit", help="Maximum number of commands to show.", min=1
+        ),
+    ] = 10,
+) -> None:
+    """Search previously suggested commands"""
+
+    store = open_history()
+    if store is None:
+        rich.print(
+            "[bold yellow]Error[/]: Failed to open the history.",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    try:
+        entries = store.search(" ".join(terms), limit=limit)
+    finally:
+        store.close()
+
+    if not entries:
+        rich.print("No matching commands found.", file=sys.stderr)
+        raise typer.Exit(1)
+
+    for entry in entries:
+        date = datetime.fromtimestamp(entry.time).strftime("%Y-%m-%d %H:%M")
+        rich.print(f"[dim]{date}[/] {escape(entry.prompt)}")
+        print("    " + "\n    ".join(entry.shell_command.splitlines()))
+        if entry.is_dangerous:
+            rich.print(
+                f"    [bold red]Warning[/]: [bold yellow]{escape(entry.dangerous_consequences)}[/]"
+            )
+        print()
@@ -0,0 +1,277 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Annotated, Optional
+
+import rich
+import typer
+from rich.status import Status
+
+from shell_whiz.ai import ClientAI, TranslationError
+from shell_whiz.cache import Cache
+from shell_whiz.config import Config, ConfigError
+from shell_whiz.shell import (
+    ScriptCommand,
+    check_syntax,
+    find_shell,
+    split_blocks,
+)
+
+from ..core.ai import AUTO_MODEL, create_ai, create_classifier
+
+
+async def _translate_block(
+    *,
+    ai: ClientAI,
+    block: ScriptCommand,
+    shell: str,
+    shell_path: Optional[str],
+    semaphore: asyncio.Semaphore,
+) -> tuple[Optional[str], Optional[str]]:
+    """Returns the translation of a block and the problem with it, if any."""
+
+    async with semaphore:
+        try:
+            translation = await ai.translate_shell_script(block.text, shell)
+        except TranslationError:
+            return None, "Failed to translate the block."
+
+    if shell_path is None:
+        return translation, None
+
+    return translation, await asyncio.to_thread(
+        check_syntax, translation, shell_path
+    )
+
+
+def _assemble(
+    blocks: list[ScriptCommand], translations: dict[str, Optional[str]]
+) -> str:
+    lines: list[str] = []
+
+    end_line = 0
+    for block in blocks:
+        # Keep the blank lines between the blocks
+        lines.extend([""] * (block.line - end_line - 1))
+        translation = translations[block.text]
+        lines.append(
+            block.text if translation is None else translation.strip("\n")
+        )
+        end_line = block.end_line
+
+    return "\n".join(lines) + "\n"
+
+
+async def _run(
+    *,
+    ai: ClientAI,
+    file: Path,
+    shell: str,
+    output: Optional[Path],
+    model: str,
+    preferences: str,
+    block_lines: int,
+    jobs: int,
+    validate: bool,
+    cache: Optional[Cache],
+) -> int:
+    try:
+        blocks = split_blocks(file.read_text(), max_lines=block_lines)
+    except (os.error, UnicodeDecodeError):
+        rich.print(
+            f"[bold yellow]Error[/]: Failed to read {file}.", file=sys.stderr
+        )
+        return 1
+
+    # Blocks are translated once per unique text and the results are cached
+    translations: dict[str, Optional[str]] = {}
+    untranslated: dict[str, ScriptCommand] = {}
+    for block in blocks:
+        cached = (
+            cache.get(Cache.make_key(model, shell, preferences, block.text))
+            if cache
+            else None
+        )
+        if cached is not None:
+            translations[block.text] = cached
+        else:
+            untranslated.setdefault(block.text, block)
+
+    # Translations are checked only if the shell is installed locally
+    shell_path = find_shell(shell) if validate else None
+
+    problems: dict[str, str] = {}
+    if untranslated:
+        semaphore = asyncio.Semaphore(jobs)
+        with Status(
+            f"Wait, Shell Whiz is translating {len(untranslated)} blocks..."
+        ):
+            results = await asyncio.gather(
+                *(
+                    _translate_block(
+                        ai=ai,
+                        block=block,
+                        shell=shell,
+                        shell_path=shell_path,
+                        semaphore=semaphore,
+                    )
+                    for block in untranslated.values()
+                )
+            )
+
+        for text, (translation, problem) in zip(untranslated, results):
+            translations[text] = translation
+            if problem:
+                problems[text] = problem
+            elif cache and translation is not None:
+                cache.set(
+                    Cache.make_key(model, shell, preferences, text),
+                    translation,
+                )
+
+    if cache:
+        cache.save()
+
+    script = _assemble(blocks, translations)
+    if output:
+        try:
+            output.write_text(script)
+        except os.error:
+            rich.print(
+                f"[bold yellow]Error[/]: Failed to write {output}.",
+                file=sys.stderr,
+            )
+            return 1
+    else:
+        sys.stdout.write(script)
+
+    # Blocks that occur several times are only reported once
+    reported = set()
+    for block in blocks:
+        if block.text in problems and block.text not in reported:
+            rich.print(
+                f"{file.as_posix()}:{block.line}: [bold yellow]Error[/]: {problems[block.text]}",
+                file=sys.stderr,
+            )
+            reported.add(block.text)
+
+    return 1 if problems else 0
+
+
+def translate(
+    file: Annotated[
+        Path,
+        typer.Argument(
+            exists=True, dir_okay=False, readable=True, show_default=False
+        ),
+    ],
+    shell: Annotated[
+        str,
+        typer.Option(
+            "--to",
+            help="Shell to translate the script to, e.g. powershell, bash or fish.",
+            show_default=False,
+        ),
+    ],
+    output: Annotated[
+        Optional[Path],
+        typer.Option(
+            "-o",
+            "--output",
+            dir_okay=False,
+            help="File to write the translated script to instead of the standard output.",
+            show_default=False,
+        ),
+    ] = None,
+    preferences: Annotated[
+        Optional[str],
+        typer.Option(
+            "-p",
+            "--preferences",
+            help="Preferences for the AI assistant. By default, the target shell.",
+            show_default=False,
+        ),
+    ] = None,
+    model: Annotated[
+        str,
+        typer.Option(
+            "-m",
+            "--model",
+            help=f"AI model to use. Use '{AUTO_MODEL}' to pick the model of each request by its complexity.",
+        ),
+    ] = "gpt-4o-mini",
+    block_lines: Annotated[
+        int,
+        typer.Option(
+            help="Approximate number of lines of the script translated by a single request.",
+            min=5,
+        ),
+    ] = 40,
+    jobs: Annotated[
+        int,
+        typer.Option(
+            "-j", "--jobs", help="Number of concurrent requests.", min=1
+        ),
+    ] = 4,
+    validate: Annotated[
+        bool,
+        typer.Option(
+            help="Check the syntax of the translation if the shell is installed."
+        ),
+    ] = True,
+    cache: Annotated[
+        bool, typer.Option(help="Reuse the translations of unchanged blocks.")
+    ] = True,
+) -> None:
+    """Translate a shell script to another shell"""
+
+    try:
+        config = Config()
+    except ConfigError:
+        rich.print(
+            "[bold yellow]Error[/]: Please set your OpenAI API key via [bold green]sw config[/] and try again.",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    if preferences is None:
+        preferences = f"I use {shell}"
+
+    translation_cache = None
+    if cache:
+        try:
+            translation_cache = Cache(
+                os.path.join(Config.get_directory(), "translations.json")
+            )
+        except ConfigError:
+            pass
+
+    classifier = create_classifier() if model == AUTO_MODEL else None
+
+    try:
+        exit_code = asyncio.run(
+            _run(
+                ai=create_ai(
+                    config=config,
+                    model=model,
+                    preferences=preferences,
+                    cache=False,
+                    classifier=classifier,
+                ),
+                file=file,
+                shell=shell,
+                output=output,
+                model=model,
+                preferences=preferences,
+                block_lines=block_lines,
+                jobs=jobs,
+                validate=validate,
+                cache=translation_cache,
+            )
+        )
+    finally:
+        if classifier:
+            classifier.close()
+
+    raise typer.Exit(exit_code)
@@ -0,0 +1,170 @@
+import os
+from typing import Any, Optional
+
+from shell_whiz.ai import (
+    ClientAI,
+    ComplexityClassifier,
+    ExplanationCache,
+    ProviderAI,
+    ProviderCachedExplanations,
+    ProviderOpenAI,
+    ProviderParallelExplanations,
+    ProviderRouter,
+    SingleFlight,
+)
+from shell_whiz.config import Config, ConfigError
+from shell_whiz.shell import EnvironmentProbe
+
+# Lets the complexity classifier pick the model of each request
+AUTO_MODEL = "auto"
+
+
+def create_classifier() -> ComplexityClassifier:
+    try:
+        log_path: Optional[str] = os.path.join(
+            Config.get_directory(), "models.jsonl"
+        )
+    except ConfigError:
+        log_path = None
+
+    return ComplexityClassifier(log_path=log_path)
+
+
+def create_ai(
+    *,
+    config: Config,
+    model: str,
+    preferences: str,
+    cache: bool,
+    parallel: bool = False,
+    classifier: Optional[ComplexityClassifier] = None,
+    environment: bool = False,
+) -> ClientAI:
+    if classifier:
+        model = classifier.fast_model
+
+    description = _describe_environment() if environment else None
+    single_flight = (
+        _create_single_flight() if config.single_flight is not False else None
+    )
+
+    api: ProviderAI = ProviderOpenAI(
+        api_key=config.openai_api_key,
+        organization=config.openai_org_id,
+        model=model,
+        preferences=preferences,
+        classifier=classifier,
+        environment=description,
+        single_flight=single_flight,
+    )
+
+    if config.backends:
+        api = _create_router(
+            config=config,
+            model=model,
+            preferences=preferences,
+            classifier=classifier,
+            environment=description,
+            single_flight=single_flight,
+        )
+
+    if cache:
+        try:
+            directory = Config.get_directory()
+        except ConfigError:
+            pass
+        else:
+            api = ProviderCachedExplanations(
+                api,
+                ExplanationCache(os.path.join(directory, "explanations.json")),
+            )
+
+    if parallel:
+        api = ProviderParallelExplanations(api)
+
+    return ClientAI(api)
+
+
+def _create_router(
+    *,
+    config: Config,
+    model: str,
+    preferences: str,
+    classifier: Optional[ComplexityClassifier],
+    environment: Optional[str],
+    single_flight: Optional[SingleFlight],
+) -> ProviderRouter:
+    # The conversation is shared, so that it continues on another backend
+    conversation: list[Any] = []
+
+    backends: list[tuple[str, ProviderAI]] = [
+        (
+            "default",
+            ProviderOpenAI(
+                api_key=config.openai_api_key,
+                organization=config.openai_org_id,
+                model=model,
+                preferences=preferences,
+                conversation=conversation,
+                classifier=classifier,
+                environment=environment,
+                single_flight=single_flight,
+            ),
+        )
+    ]
+    for backend in config.backends:
+        backends.append(
+            (
+                backend.name,
+                ProviderOpenAI(
+                    api_key=backend.openai_api_key or config.openai_api_key,
+                    organization=(
+                        backend.openai_org_id
+                        if backend.openai_api_key
+                        else backend.openai_org_id or config.openai_org_id
+                    ),
+                    base_url=backend.base_url,
+                    model=backend.model or model,
+                    preferences=preferences,
+                    conversation=conversation,
+                    # Backends with a model of their own always use it
+                    classifier=None if backend.model else classifier,
+                    environment=environment,
+                    single_flight=single_flight,
+                ),
+            )
+        )
+
+    try:
+        state_path = os.path.join(Config.get_directory(), "backends.json")
+    except ConfigError:
+        state_path = None
+
+    return ProviderRouter(
+        backends, timeout=config.timeout or 30.0, state_path=state_path
+    )
+
+
+def _create_single_flight() -> SingleFlight:
+    # Identical requests of several processes are shared through files
+    try:
+        directory: Optional[str] = os.path.join(
+            Config.get_directory(), "inflight"
+        )
+    except ConfigError:
+        directory = None
+
+    return SingleFlight(directory)
+
+
+def _describe_environment() -> Optional[str]:
+    try:
+        directory = Config.get_directory()
+    except ConfigError:
+        return None
+
+    return (
+        EnvironmentProbe(os.path.join(directory, "environment.json"))
+        .probe()
+        .describe()
+    )
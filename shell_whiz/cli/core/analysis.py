@@ -0,0 +1,93 @@
+from collections.abc import Hashable
+from typing import Optional
+
+from shell_whiz.shell import Segment, get_semantic_key, split_segments
+
+
+def _split_explanation(explanation: str, n: int) -> Optional[list[str]]:
+    """
+    Splits an explanation into its top-level list items, one per segment
+    of the shell command. Returns None if they don't match the segments.
+    """
+
+    parts: list[str] = []
+    for line in explanation.strip("\n").splitlines(keepends=True):
+        if line.startswith("- "):
+            parts.append(line)
+        elif parts:
+            parts[-1] += line
+        elif line.strip():
+            return None
+
+    if len(parts) != n:
+        return None
+
+    return [part if part.endswith("\n") else part + "\n" for part in parts]
+
+
+class IncrementalAnalysis:
+    """
+    Remembers the danger verdicts and explanations of the shell commands
+    of a session, so that a revised command that means the same isn't
+    analysed again. Explanations are also remembered per segment, so
+    only the changed segments of a revised command need to be explained.
+
+    Verdicts are only reused for whole commands, since the danger of a
+    segment depends on the rest of the command. Explanations are assigned
+    to the segments if each of the segments is explained by a top-level
+    list item, as the prompt asks for.
+    """
+
+    def __init__(self) -> None:
+        self.__verdicts: dict[Hashable, tuple[bool, str]] = {}
+        self.__explanations: dict[Hashable, str] = {}
+        self.__segment_explanations: dict[Hashable, str] = {}
+
+    def remember(
+        self,
+        shell_command: str,
+        *,
+        verdict: Optional[tuple[bool, str]] = None,
+        explanation: str = "",
+    ) -> None:
+        key = get_semantic_key(shell_command)
+
+        if verdict is not None:
+            self.__verdicts[key] = verdict
+
+        if explanation:
+            self.__explanations[key] = explanation
+            segments = split_segments(shell_command) or []
+            parts = _split_explanation(explanation, len(segments))
+            for segment, part in zip(segments, parts or []):
+                self.__segment_explanations.setdefault(segment.key, part)
+
+    def remember_segment(self, segment: Segment, *, explanation: str) -> None:
+        self.__segment_explanations[segment.key] = explanation
+
+    def get_verdict(self, shell_command: str) -> Optional[tuple[bool, str]]:
+        return self.__verdicts.get(get_semantic_key(shell_command))
+
+    def get_explanation(self, shell_command: str) -> Optional[str]:
+        return self.__explanations.get(get_semantic_key(shell_command))
+
+    def get_segment_explanations(
+        self, shell_command: str
+    ) -> Optional[list[tuple[Segment, Optional[str]]]]:
+        """
+        Returns the segments of a shell command along with their known
+        explanations, or None if none of them are known.
+        """
+
+        segments = split_segments(shell_command)
+        if not segments:
+            return None
+
+        explanations = [
+            (segment, self.__segment_explanations.get(segment.key))
+            for segment in segments
+        ]
+        if all(explanation is None for _, explanation in explanations):
+            return None
+
+        return explanations
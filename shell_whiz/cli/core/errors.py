@@ -0,0 +1,36 @@
+import asyncio
+import sys
+from typing import Union
+
+import openai
+import rich
+
+# Errors of the API requests, including the ones raised by `ProviderRouter`
+# once all of its backends have timed out or failed to connect
+API_ERRORS = (openai.APIError, asyncio.TimeoutError, ConnectionError)
+
+
+def report_api_error(
+    error: Union[openai.APIError, asyncio.TimeoutError, ConnectionError],
+) -> None:
+    # A timeout of the API is also an API connection error
+    if isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError)):
+        message = "OpenAI API request timed out. Please retry your request after a brief wait."
+    elif isinstance(error, openai.BadRequestError):  # API status error
+        message = "Your request was malformed or missing some required parameters, such as a token or an input."
+    elif isinstance(error, openai.AuthenticationError):  # API status error
+        message = "Check your API key and make sure it is correct and active. You may need to generate a new one from https://platform.openai.com/api-keys."
+    elif isinstance(error, openai.PermissionDeniedError):  # API status error
+        message = "Your API key does not have the required scope or role to perform the requested action. Make sure your API key has the appropriate permissions for the action or model accessed."
+    elif isinstance(error, openai.RateLimitError):  # API status error
+        message = "OpenAI API request exceeded rate limit. If you are on a free plan, please upgrade to a paid plan for a better experience. Visit https://platform.openai.com/account/limits for more information."
+    elif isinstance(error, openai.InternalServerError):  # API status error
+        message = "OpenAI API request failed due to a temporary server-side issue. Please retry your request after a brief wait. Visit https://status.openai.com for more information."
+    elif isinstance(error, (openai.APIConnectionError, ConnectionError)):
+        message = "OpenAI API request failed to connect. Please check your internet connection and try again."
+    elif isinstance(error, openai.APIStatusError):
+        message = "An error occurred while connecting to the OpenAI API. Please retry your request after a brief wait. Visit https://status.openai.com for more information."
+    else:
+        message = "An unknown error occurred while connecting to the OpenAI API. Please retry your request after a brief wait."
+
+    rich.print(f"[bold yellow]Error[/]: {message}", file=sys.stderr)
@@ -0,0 +1,13 @@
+import os
+import sqlite3
+from typing import Optional
+
+from shell_whiz.config import Config, ConfigError
+from shell_whiz.history import History
+
+
+def open_history() -> Optional[History]:
+    try:
+        return History(os.path.join(Config.get_directory(), "history.db"))
+    except (ConfigError, os.error, sqlite3.Error):
+        return None
@@ -13,6 +13,8 @@ class ShellCommand:
     args: str
     is_dangerous: bool = False
     dangerous_consequences: str = ""
+    explanation: str = ""
+    is_run: bool = False
 
     def __init__(self, args: str) -> None:
         self.args = args
@@ -48,6 +50,8 @@ class ShellCommand:
             ).unsafe_ask_async():
                 raise typer.Exit(1)
 
+        self.is_run = True
+
         if output_file:
             try:
                 with open(output_file, mode="w", newline="\n") as f:
@@ -9,14 +9,28 @@ class ConfigError(Exception):
     pass
 
 
+class BackendModel(BaseModel):
+    name: str
+    base_url: Optional[str] = None
+    openai_api_key: Optional[str] = None
+    openai_org_id: Optional[str] = None
+    model: Optional[str] = None
+
+
 class _ConfigModelNotStrict(BaseModel):
     openai_api_key: Optional[str] = None
     openai_org_id: Optional[str] = None
+    backends: Optional[list[BackendModel]] = None
+    timeout: Optional[float] = None
+    single_flight: Optional[bool] = None
 
 
 class ConfigModel(BaseModel):
     openai_api_key: str
     openai_org_id: Optional[str] = None
+    backends: Optional[list[BackendModel]] = None
+    timeout: Optional[float] = None
+    single_flight: Optional[bool] = None
 
 
 class Config:
@@ -82,6 +96,13 @@ class Config:
                 f"Failed to change permissions for {config_file} to read and write for the current user only."
             )
 
+    @staticmethod
+    def get_directory() -> str:
+        """Returns the directory for the configuration and local data."""
+
+        directory, _ = Config.__get_config_path()
+        return directory
+
     @staticmethod
     def __get_config_path() -> tuple[str, str]:
         directory = None
@@ -0,0 +1,222 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+@dataclass
+class HistoryEntry:
+    prompt: str
+    shell_command: str
+    # None if the command hasn't been checked
+    is_dangerous: Optional[bool] = None
+    dangerous_consequences: str = ""
+    explanation: str = ""
+    is_run: bool = False
+    time: float = field(default_factory=time.time)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    time REAL NOT NULL,
+    prompt TEXT NOT NULL,
+    shell_command TEXT NOT NULL,
+    is_dangerous INTEGER,
+    dangerous_consequences TEXT NOT NULL,
+    explanation TEXT NOT NULL,
+    is_run INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_time ON entries (time);
+"""
+
+# The full-text index is kept in sync with the entries by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+    prompt, shell_command, explanation,
+    content = 'entries', content_rowid = 'rowid'
+);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, prompt, shell_command, explanation)
+    VALUES (new.rowid, new.prompt, new.shell_command, new.explanation);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, prompt, shell_command, explanation)
+    VALUES ('delete', old.rowid, old.prompt, old.shell_command, old.explanation);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, prompt, shell_command, explanation)
+    VALUES ('delete', old.rowid, old.prompt, old.shell_command, old.explanation);
+    INSERT INTO entries_fts (rowid, prompt, shell_command, explanation)
+    VALUES (new.rowid, new.prompt, new.shell_command, new.explanation);
+END;
+"""
+
+_COLUMNS = (
+    "id",
+    "time",
+    "prompt",
+    "shell_command",
+    "is_dangerous",
+    "dangerous_consequences",
+    "explanation",
+    "is_run",
+)
+
+
+def _connect(path: str) -> tuple[sqlite3.Connection, bool]:
+    connection = sqlite3.connect(path, timeout=5)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(_SCHEMA)
+
+    # FTS5 may be missing from the SQLite library Python is built with
+    try:
+        connection.executescript(_FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        has_fts = False
+    else:
+        has_fts = True
+
+    return connection, has_fts
+
+
+def _to_entry(row: Any) -> HistoryEntry:
+    values = dict(zip(_COLUMNS, row))
+    if values["is_dangerous"] is not None:
+        values["is_dangerous"] = bool(values["is_dangerous"])
+    values["is_run"] = bool(values["is_run"])
+    return HistoryEntry(**values)
+
+
+class History:
+    """
+    Local history of suggested shell commands stored in SQLite with
+    a full-text index. Entries are written by a background thread in
+    batches, so saving them never blocks the caller. Only the most
+    recent `max_entries` entries are kept.
+    """
+
+    def __init__(self, path: str, *, max_entries: int = 5000) -> None:
+        self.__path = path
+        self.__max_entries = max_entries
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__connection, self.__has_fts = _connect(path)
+
+        self.__queue: queue.Queue[Optional[HistoryEntry]] = queue.Queue()
+        self.__writer: Optional[threading.Thread] = None
+
+    def save(self, entry: HistoryEntry) -> None:
+        """Adds or updates an entry in the background."""
+
+        if self.__writer is None:
+            self.__writer = threading.Thread(target=self.__write, daemon=True)
+            self.__writer.start()
+
+        # A copy, so that later changes of the entry are saved separately
+        self.__queue.put(HistoryEntry(**vars(entry)))
+
+    def search(self, terms: str, *, limit: int = 10) -> list[HistoryEntry]:
+        """
+        Returns the entries that contain all the terms (as prefixes of
+        words), the best matches first.
+        """
+
+        words = terms.split()
+        if not words:
+            return []
+
+        columns = ", ".join(f"entries.{column}" for column in _COLUMNS)
+
+        if self.__has_fts:
+            query = " ".join(
+                '"{0}"*'.format(word.replace('"', '""')) for word in words
+            )
+            rows = self.__connection.execute(
+                f"SELECT {columns} FROM entries_fts"
+                " JOIN entries ON entries.rowid = entries_fts.rowid"
+                " WHERE entries_fts MATCH ?"
+                " ORDER BY entries_fts.rank, entries.time DESC LIMIT ?",
+                (query, limit),
+            )
+        else:
+            conditions = " AND ".join(
+                "(prompt || ' ' || shell_command || ' ' || explanation)"
+                " LIKE ? ESCAPE '\\'"
+                for _ in words
+            )
+            patterns = [
+                "%{0}%".format(
+                    word.replace("\\", "\\\\")
+                    .replace("%", "\\%")
+                    .replace("_", "\\_")
+                )
+                for word in words
+            ]
+            rows = self.__connection.execute(
+                f"SELECT {columns} FROM entries WHERE {conditions}"
+                " ORDER BY time DESC LIMIT ?",
+                (*patterns, limit),
+            )
+
+        return [_to_entry(row) for row in rows]
+
+    def close(self) -> None:
+        """Waits until the saved entries are written."""
+
+        if self.__writer is not None:
+            self.__queue.put(None)
+            self.__writer.join()
+            self.__writer = None
+
+        self.__connection.close()
+
+    def __write(self) -> None:
+        connection, _ = _connect(self.__path)
+
+        is_closed = False
+        while not is_closed:
+            batch = [self.__queue.get()]
+            while not self.__queue.empty():
+                batch.append(self.__queue.get_nowait())
+
+            entries = [entry for entry in batch if entry is not None]
+            is_closed = len(entries) < len(batch)
+
+            try:
+                with connection:
+                    self.__insert(connection, entries)
+                    self.__prune(connection)
+            except sqlite3.Error:
+                pass
+
+        connection.close()
+
+    def __insert(
+        self, connection: sqlite3.Connection, entries: list[HistoryEntry]
+    ) -> None:
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        updates = ", ".join(
+            f"{column} = excluded.{column}" for column in _COLUMNS[1:]
+        )
+        connection.executemany(
+            f"INSERT INTO entries ({', '.join(_COLUMNS)})"
+            f" VALUES ({placeholders})"
+            f" ON CONFLICT (id) DO UPDATE SET {updates}",
+            [
+                tuple(getattr(entry, column) for column in _COLUMNS)
+                for entry in entries
+            ],
+        )
+
+    def __prune(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            "DELETE FROM entries WHERE rowid IN"
+            " (SELECT rowid FROM entries ORDER BY time DESC LIMIT -1 OFFSET ?)",
+            (self.__max_entries,),
+        )
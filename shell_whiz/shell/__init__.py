@@ -0,0 +1,17 @@
+from .environment import Environment, EnvironmentProbe
+from .manpages import read_manual
+from .parser import (
+    Command,
+    CommandList,
+    Pipeline,
+    Redirection,
+    ShellSyntaxError,
+    UnsupportedSyntaxError,
+    Word,
+    parse,
+)
+from .programs import BUILTINS, get_missing_programs, get_programs
+from .ranking import rank_shell_commands
+from .scripts import ScriptCommand, split_blocks, split_script
+from .segments import Segment, get_semantic_key, split_segments
+from .validation import ShellCommandValidator, check_syntax, find_shell
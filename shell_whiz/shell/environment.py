@@ -0,0 +1,316 @@
+import os
+import platform
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from shell_whiz.cache import read_json, write_json
+
+# Programs worth mentioning to LLM, since there are alternatives to them
+# or they tell which package manager and service manager to use
+_NOTABLE_PROGRAMS = (
+    "apt",
+    "dnf",
+    "yum",
+    "pacman",
+    "zypper",
+    "apk",
+    "brew",
+    "port",
+    "nix",
+    "snap",
+    "flatpak",
+    "winget",
+    "systemctl",
+    "launchctl",
+    "service",
+    "sudo",
+    "doas",
+    "git",
+    "docker",
+    "podman",
+    "python3",
+    "node",
+    "jq",
+    "yq",
+    "rg",
+    "fd",
+    "fdfind",
+    "fzf",
+    "bat",
+    "eza",
+    "gawk",
+    "gsed",
+    "gfind",
+    "gdate",
+    "curl",
+    "wget",
+    "rsync",
+    "ffmpeg",
+    "magick",
+    "convert",
+    "ip",
+    "ifconfig",
+    "ss",
+    "netstat",
+    "lsof",
+    "zip",
+    "7z",
+    "xclip",
+    "wl-copy",
+    "pbcopy",
+)
+
+# Programs whose versions matter, since their flags changed over time
+_VERSIONED_PROGRAMS = frozenset(
+    {"git", "docker", "python3", "node", "jq", "curl", "rsync", "ffmpeg"}
+)
+
+_VERSION = re.compile(r"\d+(?:\.\d+)+")
+
+
+@dataclass
+class Environment:
+    system: str
+    shell: str
+    userland: str
+    programs: set[str] = field(default_factory=set)
+    versions: dict[str, str] = field(default_factory=dict)
+
+    def describe(self) -> str:
+        """Returns a compact summary of the environment for LLM."""
+
+        installed = [
+            (
+                f"{program} {self.versions[program]}"
+                if program in self.versions
+                else program
+            )
+            for program in _NOTABLE_PROGRAMS
+            if program in self.programs
+        ]
+        missing = [
+            program
+            for program in _NOTABLE_PROGRAMS
+            if program not in self.programs
+        ]
+
+        lines = [
+            f"OS: {self.system}",
+            f"Shell: {self.shell}",
+            f"Core utilities: {self.userland}",
+            f"Installed: {', '.join(installed) or 'none of the usual tools'}",
+        ]
+        if missing:
+            lines.append(f"Not installed: {', '.join(missing)}")
+
+        return "\n".join(lines)
+
+
+def _get_system() -> str:
+    system = platform.system()
+
+    if system == "Linux":
+        try:
+            with open("/etc/os-release") as f:
+                match = re.search(r'^PRETTY_NAME="?([^"\n]*)', f.read(), re.M)
+        except OSError:
+            match = None
+        if match:
+            return f"{match.group(1)} (Linux {platform.machine()})"
+    elif system == "Darwin":
+        return f"macOS {platform.mac_ver()[0]} ({platform.machine()})"
+
+    return f"{system} {platform.release()} ({platform.machine()})"
+
+
+def _list_programs(directory: str) -> list[str]:
+    extensions = [
+        extension.lower()
+        for extension in os.environ.get("PATHEXT", "").split(os.pathsep)
+        if extension
+    ]
+
+    programs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+
+                if os.name == "nt":
+                    name, extension = os.path.splitext(entry.name)
+                    if extension.lower() in extensions:
+                        programs.append(name.lower())
+                elif os.access(entry.path, os.X_OK):
+                    programs.append(entry.name)
+    except OSError:
+        pass
+
+    return programs
+
+
+def _read_version(path: str) -> str:
+    """Returns the first line printed by `program --version`."""
+
+    try:
+        process = subprocess.run(
+            [path, "--version"],
+            capture_output=True,
+            text=True,
+            timeout=2,
+            stdin=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+    output = (process.stdout or process.stderr).strip()
+    return output.splitlines()[0] if output else ""
+
+
+class EnvironmentProbe:
+    """
+    Finds the programs on $PATH, the versions of some of them, the shell
+    and the OS flavour. The results are cached in a JSON file: a directory
+    of $PATH is only listed again if its modification time has changed,
+    and a program is only run again if it has been modified.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.__path = path
+        self.__is_modified = False
+
+        cache = read_json(path)
+        if not isinstance(cache, dict):
+            cache = {}
+        self.__directories: dict[str, Any] = cache.get("directories", {})
+        self.__versions: dict[str, Any] = cache.get("versions", {})
+
+    def probe(self) -> Environment:
+        directories = list(
+            dict.fromkeys(
+                directory
+                for directory in os.environ.get("PATH", "").split(os.pathsep)
+                if directory
+            )
+        )
+
+        # Forget the directories that are no longer on $PATH
+        if set(self.__directories) - set(directories):
+            self.__directories = {
+                directory: entry
+                for directory, entry in self.__directories.items()
+                if directory in directories
+            }
+            self.__is_modified = True
+
+        programs: dict[str, str] = {}
+        for directory in directories:
+            # Earlier directories of $PATH take precedence
+            for program in self.__get_programs(directory):
+                programs.setdefault(program, os.path.join(directory, program))
+
+        shell_path = os.environ.get("SHELL") or os.environ.get("COMSPEC", "")
+        shell = os.path.basename(shell_path)
+
+        paths = {
+            program: programs[program]
+            for program in _VERSIONED_PROGRAMS
+            if program in programs
+        }
+        if shell_path and os.name != "nt":
+            paths[shell] = shell_path
+        if "ls" in programs:
+            paths["ls"] = programs["ls"]
+        outputs = self.__get_versions(paths)
+
+        versions = {}
+        for program, output in outputs.items():
+            match = _VERSION.search(output)
+            if match:
+                versions[program] = match.group()
+
+        if "GNU" in outputs.get("ls", ""):
+            userland = f"GNU coreutils {versions.get('ls', '')}".rstrip()
+        elif os.name == "nt":
+            userland = "Windows"
+        else:
+            userland = "BSD"
+
+        self.__save()
+
+        return Environment(
+            system=_get_system(),
+            shell=f"{shell} {versions.get(shell, '')}".strip() or "unknown",
+            userland=userland,
+            programs=set(programs),
+            versions={
+                program: version
+                for program, version in versions.items()
+                if program in _VERSIONED_PROGRAMS
+            },
+        )
+
+    def __get_programs(self, directory: str) -> list[str]:
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            return []
+
+        entry = self.__directories.get(directory)
+        if not isinstance(entry, dict) or entry.get("mtime") != mtime:
+            entry = {"mtime": mtime, "programs": _list_programs(directory)}
+            self.__directories[directory] = entry
+            self.__is_modified = True
+
+        return entry["programs"]
+
+    def __get_versions(self, paths: dict[str, str]) -> dict[str, str]:
+        # Forget the programs that are no longer used
+        if set(self.__versions) - set(paths.values()):
+            self.__versions = {
+                path: entry
+                for path, entry in self.__versions.items()
+                if path in paths.values()
+            }
+            self.__is_modified = True
+
+        outputs = {}
+        outdated = {}
+        for program, path in paths.items():
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+
+            entry = self.__versions.get(path)
+            if isinstance(entry, dict) and entry.get("mtime") == mtime:
+                outputs[program] = entry["output"]
+            else:
+                outdated[program] = (path, mtime)
+
+        if outdated:
+            with ThreadPoolExecutor() as executor:
+                results = executor.map(
+                    _read_version, [path for path, _ in outdated.values()]
+                )
+                for (program, (path, mtime)), output in zip(
+                    outdated.items(), results
+                ):
+                    outputs[program] = output
+                    self.__versions[path] = {"mtime": mtime, "output": output}
+            self.__is_modified = True
+
+        return outputs
+
+    def __save(self) -> None:
+        if self.__is_modified and write_json(
+            self.__path,
+            {"directories": self.__directories, "versions": self.__versions},
+        ):
+            self.__is_modified = False
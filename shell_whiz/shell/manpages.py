@@ -0,0 +1,64 @@
+import os
+import re
+import subprocess
+
+_FLAG = re.compile(r"(?:^|[\s,])(--?[A-Za-z0-9?][\w-]*)")
+
+
+def _shorten(description: str) -> str:
+    description = " ".join(description.split())
+    description = re.split(r"(?<=\.)\s", description, maxsplit=1)[0]
+    return description.rstrip(".;:, ")
+
+
+def read_manual(program: str) -> tuple[str, dict[str, str]]:
+    """
+    Reads the description of a program and its flags from its man page.
+    Returns empty values if the man page is unavailable.
+    """
+
+    if not re.fullmatch(r"[\w.+-]+", program):
+        return "", {}
+
+    try:
+        manual = subprocess.run(
+            ["man", program],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            env=os.environ | {"MANPAGER": "cat", "MANWIDTH": "120"},
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return "", {}
+
+    # Remove overstriking used for bold and underlined text
+    lines = re.sub(r".\x08", "", manual).splitlines()
+
+    description = ""
+    flags: dict[str, str] = {}
+
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+
+        if not description and stripped == "NAME" and i + 1 < len(lines):
+            _, sep, summary = lines[i + 1].partition(" - ")
+            if not sep:
+                _, sep, summary = lines[i + 1].partition(" — ")
+            description = _shorten(summary)
+        elif stripped.startswith("-") and line.startswith(" "):
+            header, *rest = re.split(r"\s{2,}|\t", stripped, maxsplit=1)
+            if rest:
+                text = rest[0]
+            elif i + 1 < len(lines):
+                text = lines[i + 1].strip()
+            else:
+                continue
+
+            text = _shorten(text)
+            if not text or text.startswith("-"):
+                continue
+
+            for flag in _FLAG.findall(header):
+                flags.setdefault(flag, text)
+
+    return description, flags
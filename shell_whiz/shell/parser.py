@@ -0,0 +1,533 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+class ShellSyntaxError(Exception):
+    pass
+
+
+class UnsupportedSyntaxError(ShellSyntaxError):
+    """The command may be valid, but uses syntax the parser doesn't support."""
+
+
+@dataclass
+class Word:
+    text: str
+    value: str
+    substitutions: list["CommandList"] = field(default_factory=list)
+
+
+@dataclass
+class Redirection:
+    text: str
+    operator: str
+    target: str
+    body: str = ""
+
+
+@dataclass
+class Command:
+    text: str
+    assignments: list[Word] = field(default_factory=list)
+    words: list[Word] = field(default_factory=list)
+    redirections: list[Redirection] = field(default_factory=list)
+
+    @property
+    def program(self) -> str:
+        return self.words[0].value if self.words else ""
+
+    @property
+    def arguments(self) -> list[Word]:
+        return self.words[1:]
+
+    @property
+    def substitutions(self) -> list["CommandList"]:
+        return [
+            substitution
+            for word in self.assignments + self.words
+            for substitution in word.substitutions
+        ]
+
+
+@dataclass
+class Pipeline:
+    text: str
+    commands: list[Command] = field(default_factory=list)
+
+
+@dataclass
+class CommandList:
+    """
+    Pipelines separated by `&&`, `||`, `;`, `&` or newlines.
+    `separators[i]` is the operator preceding `pipelines[i]`
+    (an empty string for the first pipeline).
+    """
+
+    text: str
+    pipelines: list[Pipeline] = field(default_factory=list)
+    separators: list[str] = field(default_factory=list)
+
+    @property
+    def commands(self) -> list[Command]:
+        return [
+            command
+            for pipeline in self.pipelines
+            for command in pipeline.commands
+        ]
+
+
+_OPERATORS = (
+    "&>>",
+    "<<<",
+    "<<-",
+    "&&",
+    "||",
+    "|&",
+    ";;",
+    "&>",
+    ">>",
+    ">&",
+    ">|",
+    "<<",
+    "<&",
+    "<>",
+    "|",
+    "&",
+    ";",
+    ">",
+    "<",
+    "(",
+    ")",
+)
+
+_REDIRECTION_OPERATORS = frozenset(
+    (">", ">>", ">|", "<", "<<", "<<-", "<<<", "<>", ">&", "<&", "&>", "&>>")
+)
+
+_LIST_OPERATORS = frozenset(("&&", "||", ";", "&", "\n"))
+
+_PIPELINE_OPERATORS = frozenset(("|", "|&"))
+
+_RESERVED_WORDS = frozenset(
+    (
+        "!",
+        "{",
+        "}",
+        "if",
+        "then",
+        "else",
+        "elif",
+        "fi",
+        "for",
+        "while",
+        "until",
+        "do",
+        "done",
+        "case",
+        "esac",
+        "select",
+        "function",
+    )
+)
+
+
+@dataclass
+class _Token:
+    kind: str
+    text: str
+    start: int
+    end: int
+    value: str = ""
+    substitutions: list[CommandList] = field(default_factory=list)
+    body: str = ""
+
+
+def find_closing(source: str, i: int, opening: str, closing: str) -> int:
+    """Returns the index of the bracket closing the one before `i`."""
+
+    depth = 1
+    while i < len(source):
+        c = source[i]
+        if c == "\\":
+            i += 2
+            continue
+        elif c == "'":
+            i = source.find("'", i + 1)
+            if i == -1:
+                break
+        elif c == '"':
+            i += 1
+            while i < len(source) and source[i] != '"':
+                i += 2 if source[i] == "\\" else 1
+        elif c == opening:
+            depth += 1
+        elif c == closing:
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+
+    raise ShellSyntaxError(f"Unexpected end of input, expected {closing!r}.")
+
+
+class _Tokenizer:
+    def __init__(self, source: str) -> None:
+        self.__source = source
+        self.__position = 0
+        self.__tokens: list[_Token] = []
+        self.__heredocs: list[tuple[_Token, str, bool]] = []
+        self.__heredoc_operator: Optional[_Token] = None
+
+    def tokenize(self) -> list[_Token]:
+        source = self.__source
+
+        while self.__position < len(source):
+            i = self.__position
+            c = source[i]
+
+            if c in " \t":
+                self.__position += 1
+            elif source.startswith("\\\n", i):
+                self.__position += 2
+            elif c == "#":
+                end = source.find("\n", i)
+                self.__position = len(source) if end == -1 else end
+            elif c == "\n":
+                self.__tokens.append(_Token("operator", "\n", i, i + 1))
+                self.__position += 1
+                self.__read_heredocs()
+            elif (operator := self.__match_operator(i)) is not None:
+                self.__add_operator(operator, i)
+            else:
+                self.__add_word(self.__read_word())
+
+        if self.__heredoc_operator:
+            raise ShellSyntaxError("Expected a here-document delimiter.")
+
+        return self.__tokens
+
+    def __match_operator(self, i: int) -> Optional[str]:
+        source = self.__source
+
+        # Process substitution is a part of a word
+        if source[i] in "<>" and source.startswith("(", i + 1):
+            return None
+
+        for operator in _OPERATORS:
+            if source.startswith(operator, i):
+                return operator
+
+        return None
+
+    def __add_operator(self, operator: str, i: int) -> None:
+        token = _Token("operator", operator, i, i + len(operator))
+
+        # File descriptor prefix, e.g. `2>`
+        last = self.__tokens[-1] if self.__tokens else None
+        if (
+            operator in _REDIRECTION_OPERATORS
+            and last
+            and last.kind == "word"
+            and last.end == i
+            and last.text.isdigit()
+        ):
+            self.__tokens.pop()
+            token = _Token(
+                "operator", last.text + operator, last.start, token.end
+            )
+
+        self.__tokens.append(token)
+        self.__position = token.end
+
+        if operator in ("<<", "<<-"):
+            self.__heredoc_operator = token
+
+    def __add_word(self, token: _Token) -> None:
+        self.__tokens.append(token)
+
+        if self.__heredoc_operator:
+            self.__heredocs.append(
+                (
+                    self.__heredoc_operator,
+                    token.value,
+                    self.__heredoc_operator.text.endswith("-"),
+                )
+            )
+            self.__heredoc_operator = None
+
+    def __read_heredocs(self) -> None:
+        source = self.__source
+
+        for operator, delimiter, strip_tabs in self.__heredocs:
+            body = []
+            while self.__position < len(source):
+                end = source.find("\n", self.__position)
+                end = len(source) if end == -1 else end
+                line = source[self.__position : end]
+                self.__position = min(end + 1, len(source))
+                if (line.lstrip("\t") if strip_tabs else line) == delimiter:
+                    break
+                body.append(line)
+            operator.body = "\n".join(body)
+
+        self.__heredocs = []
+
+    def __read_word(self) -> _Token:
+        source = self.__source
+        start = i = self.__position
+        value = ""
+        substitutions: list[CommandList] = []
+
+        while i < len(source):
+            c = source[i]
+
+            if c in " \t\n" or self.__match_operator(i):
+                break
+            elif c == "\\":
+                if source.startswith("\n", i + 1):
+                    i += 2
+                    continue
+                value += source[i + 1 : i + 2]
+                i += 2
+            elif c == "'":
+                end = source.find("'", i + 1)
+                if end == -1:
+                    raise ShellSyntaxError("Unterminated single quote.")
+                value += source[i + 1 : end]
+                i = end + 1
+            elif c == '"':
+                i, quoted = self.__read_double_quotes(i + 1, substitutions)
+                value += quoted
+            elif source.startswith("$'", i):
+                end = i + 2
+                while end < len(source) and source[end] != "'":
+                    end += 2 if source[end] == "\\" else 1
+                if end >= len(source):
+                    raise ShellSyntaxError("Unterminated ANSI-C quote.")
+                value += source[i + 2 : end]
+                i = end + 1
+            elif source.startswith("$((", i):
+                end = find_closing(source, i + 3, "(", ")")
+                if not source.startswith(")", end + 1):
+                    raise ShellSyntaxError(
+                        "Unterminated arithmetic expansion."
+                    )
+                value += source[i : end + 2]
+                i = end + 2
+            elif source.startswith("${", i):
+                end = find_closing(source, i + 2, "{", "}")
+                value += source[i : end + 1]
+                i = end + 1
+            elif c in "$<>" and source.startswith("(", i + 1):
+                end = find_closing(source, i + 2, "(", ")")
+                substitutions.append(parse(source[i + 2 : end]))
+                value += source[i : end + 1]
+                i = end + 1
+            elif c == "`":
+                end = self.__read_backticks(i, substitutions)
+                value += source[i:end]
+                i = end
+            else:
+                value += c
+                i += 1
+
+        self.__position = i
+
+        return _Token("word", source[start:i], start, i, value, substitutions)
+
+    def __read_double_quotes(
+        self, i: int, substitutions: list[CommandList]
+    ) -> tuple[int, str]:
+        source = self.__source
+        value = ""
+
+        while i < len(source):
+            c = source[i]
+            if c == '"':
+                return i + 1, value
+            elif c == "\\":
+                if source[i + 1 : i + 2] in ('"', "\\", "$", "`"):
+                    value += source[i + 1]
+                elif source[i + 1 : i + 2] != "\n":
+                    value += source[i : i + 2]
+                i += 2
+            elif source.startswith("$((", i):
+                end = find_closing(source, i + 3, "(", ")")
+                value += source[i : end + 2]
+                i = end + 2
+            elif source.startswith("$(", i):
+                end = find_closing(source, i + 2, "(", ")")
+                substitutions.append(parse(source[i + 2 : end]))
+                value += source[i : end + 1]
+                i = end + 1
+            elif c == "`":
+                end = self.__read_backticks(i, substitutions)
+                value += source[i:end]
+                i = end
+            else:
+                value += c
+                i += 1
+
+        raise ShellSyntaxError("Unterminated double quote.")
+
+    def __read_backticks(
+        self, i: int, substitutions: list[CommandList]
+    ) -> int:
+        source = self.__source
+
+        end = i + 1
+        while end < len(source) and source[end] != "`":
+            end += 2 if source[end] == "\\" else 1
+        if end >= len(source):
+            raise ShellSyntaxError("Unterminated backquote.")
+
+        substitutions.append(parse(source[i + 1 : end]))
+
+        return end + 1
+
+
+class _Parser:
+    def __init__(self, source: str, tokens: list[_Token]) -> None:
+        self.__source = source
+        self.__tokens = tokens
+        self.__position = 0
+
+    def parse(self) -> CommandList:
+        self.__skip_newlines()
+
+        pipelines = []
+        separators = []
+        separator = ""
+        while self.__position < len(self.__tokens):
+            pipelines.append(self.__parse_pipeline())
+            separators.append(separator)
+
+            if self.__position >= len(self.__tokens):
+                break
+
+            token = self.__tokens[self.__position]
+            if token.text not in _LIST_OPERATORS:
+                raise ShellSyntaxError(
+                    f"Syntax error near unexpected token {token.text!r}."
+                )
+            self.__position += 1
+
+            separator = token.text
+            if token.text in ("&&", "||"):
+                self.__skip_newlines()
+            elif token.text != "\n":
+                while self.__peek() == "\n":
+                    self.__position += 1
+
+        return CommandList(
+            self.__get_text(self.__tokens), pipelines, separators
+        )
+
+    def __parse_pipeline(self) -> Pipeline:
+        start = self.__position
+
+        commands = [self.__parse_command()]
+        while self.__peek() in _PIPELINE_OPERATORS:
+            self.__position += 1
+            self.__skip_newlines()
+            commands.append(self.__parse_command())
+
+        return Pipeline(
+            self.__get_text(self.__tokens[start : self.__position]), commands
+        )
+
+    def __parse_command(self) -> Command:
+        start = self.__position
+        command = Command("")
+
+        while self.__position < len(self.__tokens):
+            token = self.__tokens[self.__position]
+
+            if token.kind == "operator":
+                if token.text.lstrip("0123456789") in _REDIRECTION_OPERATORS:
+                    command.redirections.append(
+                        self.__parse_redirection(token)
+                    )
+                    continue
+                elif token.text in ("(", ")", ";;"):
+                    raise UnsupportedSyntaxError(
+                        f"Unsupported token {token.text!r}."
+                    )
+                break
+
+            word = Word(token.text, token.value, token.substitutions)
+            if not command.words and _is_assignment(token.text):
+                command.assignments.append(word)
+            elif not command.words and token.text in _RESERVED_WORDS:
+                raise UnsupportedSyntaxError(
+                    f"Compound commands like {token.text!r} are not supported."
+                )
+            else:
+                command.words.append(word)
+
+            self.__position += 1
+
+        if self.__position == start:
+            token_text = (
+                self.__tokens[start].text
+                if start < len(self.__tokens)
+                else "end of input"
+            )
+            raise ShellSyntaxError(
+                f"Syntax error near unexpected token {token_text!r}."
+            )
+
+        command.text = self.__get_text(self.__tokens[start : self.__position])
+
+        return command
+
+    def __parse_redirection(self, operator: _Token) -> Redirection:
+        self.__position += 1
+
+        if (
+            self.__position >= len(self.__tokens)
+            or self.__tokens[self.__position].kind != "word"
+        ):
+            raise ShellSyntaxError(
+                f"Expected a target after {operator.text!r}."
+            )
+
+        target = self.__tokens[self.__position]
+        self.__position += 1
+
+        return Redirection(
+            self.__source[operator.start : target.end],
+            operator.text,
+            target.value,
+            operator.body,
+        )
+
+    def __peek(self) -> Optional[str]:
+        if self.__position < len(self.__tokens):
+            return self.__tokens[self.__position].text
+        return None
+
+    def __skip_newlines(self) -> None:
+        while self.__peek() == "\n":
+            self.__position += 1
+
+    def __get_text(self, tokens: list[_Token]) -> str:
+        tokens = [token for token in tokens if token.text != "\n"]
+        if not tokens:
+            return ""
+        return self.__source[tokens[0].start : tokens[-1].end]
+
+
+def _is_assignment(text: str) -> bool:
+    name, sep, _ = text.partition("=")
+    return bool(sep) and name.isidentifier()
+
+
+def parse(source: str) -> CommandList:
+    """
+    Parses a shell command into pipelines, commands, redirections and
+    substitutions. Compound commands (`if`, `for`, subshells, etc.) are
+    not supported and raise `ShellSyntaxError`.
+    """
+
+    return _Parser(source, _Tokenizer(source).tokenize()).parse()
@@ -0,0 +1,94 @@
+import shutil
+
+from .parser import CommandList
+
+BUILTINS = frozenset(
+    (
+        ".",
+        ":",
+        "[",
+        "alias",
+        "bg",
+        "bind",
+        "break",
+        "builtin",
+        "caller",
+        "cd",
+        "command",
+        "compgen",
+        "complete",
+        "continue",
+        "declare",
+        "dirs",
+        "disown",
+        "echo",
+        "enable",
+        "eval",
+        "exec",
+        "exit",
+        "export",
+        "false",
+        "fc",
+        "fg",
+        "getopts",
+        "hash",
+        "help",
+        "history",
+        "jobs",
+        "kill",
+        "let",
+        "local",
+        "logout",
+        "mapfile",
+        "popd",
+        "printf",
+        "pushd",
+        "pwd",
+        "read",
+        "readarray",
+        "readonly",
+        "return",
+        "set",
+        "shift",
+        "shopt",
+        "source",
+        "suspend",
+        "test",
+        "times",
+        "trap",
+        "true",
+        "type",
+        "typeset",
+        "ulimit",
+        "umask",
+        "unalias",
+        "unset",
+        "wait",
+    )
+)
+
+
+def get_programs(command_list: CommandList) -> list[str]:
+    """
+    Returns the programs invoked by a shell command, including the ones
+    in command substitutions, in order of appearance.
+    """
+
+    programs = []
+    for command in command_list.commands:
+        if command.program and "$" not in command.words[0].text:
+            programs.append(command.program)
+        for substitution in command.substitutions:
+            programs.extend(get_programs(substitution))
+
+    return list(dict.fromkeys(programs))
+
+
+def get_missing_programs(command_list: CommandList) -> list[str]:
+    """Returns the programs that are neither builtins nor on $PATH."""
+
+    return [
+        program
+        for program in get_programs(command_list)
+        if program not in BUILTINS and shutil.which(program) is None
+    ]
@@ -0,0 +1,26 @@
+from .parser import ShellSyntaxError, UnsupportedSyntaxError, parse
+from .programs import get_missing_programs
+
+
+def _get_rank(shell_command: str) -> tuple[bool, int, int]:
+    try:
+        missing_programs = len(get_missing_programs(parse(shell_command)))
+        is_invalid = False
+    except UnsupportedSyntaxError:
+        missing_programs = 0
+        is_invalid = False
+    except ShellSyntaxError:
+        missing_programs = 0
+        is_invalid = True
+
+    return is_invalid, missing_programs, len(shell_command)
+
+
+def rank_shell_commands(shell_commands: list[str]) -> list[str]:
+    """
+    Sorts alternative shell commands from the most to the least suitable:
+    syntactically valid commands first, then the ones with fewer programs
+    missing from $PATH, then shorter ones.
+    """
+
+    return sorted(shell_commands, key=_get_rank)
@@ -0,0 +1,239 @@
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ScriptCommand:
+    text: str
+    line: int
+    end_line: int
+
+
+_HEREDOC = re.compile(r"<<(-?)\s*(['\"]?)([\w.-]+)\2")
+
+# Lines that only close or continue compound commands
+_TRIVIAL = re.compile(r"(\}|\)|fi|done|esac|else|then|do|;;)\s*;?")
+
+
+# Words that open and close compound commands and function bodies
+_COMPOUND = re.compile(
+    r"(?<![\w$-])(?:(if|case|for|while|until|select|\{)|(fi|esac|done|\}))(?![\w-])"
+)
+_QUOTED = re.compile(r"'[^']*'|\"(?:\\.|[^\"\\])*\"|`[^`]*`")
+_COMMENT = re.compile(r"(?:^|(?<=[\s;|&(]))#.*$", re.M)
+
+
+def split_script(source: str) -> list[ScriptCommand]:
+    """
+    Splits a shell script into logical commands, i.e. lines joined by
+    continuations, multi-line quotes and substitutions, and here-documents.
+    Lines of compound commands and function definitions are logical
+    commands of their own. Blank lines and comments are skipped.
+    """
+
+    lines = source.splitlines()
+
+    return [
+        ScriptCommand("\n".join(lines[start:end]), start + 1, end)
+        for start, end, _, has_code in _split_units(lines)
+        if has_code
+        and not _TRIVIAL.fullmatch("\n".join(lines[start:end]).strip())
+    ]
+
+
+def split_blocks(source: str, *, max_lines: int = 40) -> list[ScriptCommand]:
+    """
+    Splits a shell script into blocks that can be handled independently,
+    e.g. translated to another shell. Blocks are separated by blank lines
+    outside of compound commands and function definitions, and blocks
+    longer than `max_lines` are split between top-level commands.
+    Comments stay in their blocks, blank lines between blocks are skipped.
+    """
+
+    lines = source.splitlines()
+
+    blocks = []
+    start: Optional[int] = None
+    depth = 0
+    for unit_start, unit_end, code, has_code in _split_units(lines):
+        is_blank = not "\n".join(lines[unit_start:unit_end]).strip()
+
+        if start is not None and depth == 0:
+            if is_blank or unit_end - start > max_lines:
+                blocks.append(
+                    ScriptCommand(
+                        "\n".join(lines[start:unit_start]),
+                        start + 1,
+                        unit_start,
+                    )
+                )
+                start = None
+
+        if is_blank:
+            continue
+        if start is None:
+            start = unit_start
+
+        if has_code:
+            depth = max(depth + _get_depth_change(code), 0)
+
+    if start is not None:
+        blocks.append(
+            ScriptCommand("\n".join(lines[start:]), start + 1, len(lines))
+        )
+
+    return blocks
+
+
+def _get_depth_change(code: str) -> int:
+    code = _COMMENT.sub("", _QUOTED.sub("''", code))
+    return sum(1 if opening else -1 for opening, _ in _COMPOUND.findall(code))
+
+
+def _split_units(lines: list[str]) -> Iterator[tuple[int, int, str, bool]]:
+    """
+    Yields the first and the last line (exclusive) of each logical command,
+    its code without here-documents and whether it has any code at all.
+    """
+
+    i = 0
+    while i < len(lines):
+        start = i
+        state = _State()
+        heredocs: list[tuple[str, bool]] = []
+        code = []
+
+        while True:
+            heredocs.extend(state.feed(lines[i]))
+            code.append(lines[i])
+            i += 1
+
+            # Here-documents start after the line with the redirection
+            for delimiter, strip_tabs in heredocs:
+                while i < len(lines):
+                    line = lines[i].lstrip("\t") if strip_tabs else lines[i]
+                    i += 1
+                    if line == delimiter:
+                        break
+            heredocs = []
+
+            if state.is_complete() or i >= len(lines):
+                break
+
+        yield start, i, "\n".join(code), state.has_code
+
+
+class _State:
+    """
+    Tracks quotes, substitutions and arithmetic across the lines of
+    a logical command.
+    """
+
+    def __init__(self) -> None:
+        # Open contexts: quotes, `$'` for ANSI-C quotes, `(` for subshells
+        # and substitutions, `((` for arithmetic and `a(` for parentheses
+        # inside it
+        self.contexts: list[str] = []
+        self.is_continued = False
+        self.has_code = False
+
+    def is_complete(self) -> bool:
+        return not (self.contexts or self.is_continued)
+
+    def feed(self, line: str) -> list[tuple[str, bool]]:
+        self.is_continued = False
+        heredocs = []
+
+        i = 0
+        while i < len(line):
+            c = line[i]
+            context = self.contexts[-1] if self.contexts else ""
+
+            if context == "'":
+                if c == "'":
+                    self.contexts.pop()
+            elif context == "$'":
+                # Unlike in single quotes, `\'` doesn't end the quote
+                if c == "\\":
+                    i += 1
+                elif c == "'":
+                    self.contexts.pop()
+            elif c == "\\":
+                if i == len(line) - 1:
+                    self.is_continued = True
+                i += 1
+            elif context == '"':
+                if c == '"':
+                    self.contexts.pop()
+                elif c == "`":
+                    self.contexts.append(c)
+                elif line.startswith("$((", i):
+                    self.contexts.append("((")
+                    i += 2
+                elif line.startswith("$(", i):
+                    self.contexts.append("(")
+                    i += 1
+            elif context == "`":
+                if c == "`":
+                    self.contexts.pop()
+            elif context in ("((", "a("):
+                # Arithmetic, where `<<` is a shift
+                if c == "(":
+                    self.contexts.append("a(")
+                elif c == ")" and context == "a(":
+                    self.contexts.pop()
+                elif line.startswith("))", i):
+                    self.contexts.pop()
+                    i += 1
+            elif c == "#" and (i == 0 or line[i - 1] in " \t;|&("):
+                break
+            elif line.startswith("$'", i):
+                self.contexts.append("$'")
+                self.has_code = True
+                i += 1
+            elif c in "'\"`":
+                self.contexts.append(c)
+                self.has_code = True
+            elif line.startswith("((", i) and "))" in line[i + 2 :]:
+                # Otherwise, it's more likely to be nested subshells
+                self.contexts.append("((")
+                self.has_code = True
+                i += 1
+            elif c == "(":
+                self.contexts.append("(")
+                self.has_code = True
+            elif c == ")" and context == "(":
+                self.contexts.pop()
+            elif (
+                line.startswith("<<", i)
+                and not line.startswith("<<<", i)
+                and not line.startswith("<", i - 1)
+            ):
+                match = _HEREDOC.match(line, i)
+                if match:
+                    heredocs.append((match.group(3), match.group(1) == "-"))
+                    self.has_code = True
+                    i = match.end()
+                    continue
+            elif not c.isspace():
+                self.has_code = True
+
+            i += 1
+
+        is_quoted = bool(self.contexts) and self.contexts[-1] in (
+            "'",
+            "$'",
+            '"',
+            "`",
+        )
+
+        # Lines ending with an operator continue on the next line
+        if not is_quoted and line[:i].rstrip().endswith(("&&", "||", "|")):
+            self.is_continued = True
+
+        if is_quoted:
+            return []
+
+        return heredocs
@@ -0,0 +1,230 @@
+import re
+from collections.abc import Hashable, Iterator
+from dataclasses import dataclass
+from typing import Optional
+
+from .parser import (
+    Command,
+    CommandList,
+    Redirection,
+    ShellSyntaxError,
+    Word,
+    find_closing,
+    parse,
+)
+
+
+@dataclass
+class Segment:
+    """A simple command of a pipeline or a list of commands."""
+
+    text: str
+    # Operator that connects the segment to the previous one, if any
+    operator: str
+    # Equal for segments that only differ in whitespace and quoting
+    # that don't change their meaning
+    key: Hashable
+
+
+# Unquoted characters that may mean more than themselves, e.g. globs
+_SPECIAL_CHARACTERS = frozenset("*?[]{},~!")
+
+_PARAMETER = re.compile(r"\$(?:[A-Za-z_]\w*|[0-9@*#?$!-])")
+
+
+def _get_text_key(text: str, substitutions: Iterator[CommandList]) -> Hashable:
+    """
+    Returns a key of a word that is equal for words that only differ in
+    quoting that doesn't change their meaning. Quoted characters are only
+    distinguished from unquoted ones if they would be expanded unquoted,
+    and expansions are distinguished by whether they are quoted.
+    """
+
+    parts: list[Hashable] = []
+    literal = ""
+    is_quoted = False
+
+    def add(part: Hashable) -> None:
+        nonlocal literal
+        if literal:
+            parts.append(literal)
+            literal = ""
+        parts.append(part)
+
+    i = 0
+    while i < len(text):
+        c = text[i]
+
+        if c == "\\":
+            if text.startswith("\n", i + 1):
+                pass
+            elif not is_quoted or text[i + 1 : i + 2] in ('"', "\\", "$", "`"):
+                literal += text[i + 1 : i + 2]
+            else:
+                literal += text[i : i + 2]
+            i += 2
+        elif c == '"':
+            is_quoted = not is_quoted
+            i += 1
+        elif c == "'" and not is_quoted:
+            end = text.find("'", i + 1)
+            end = len(text) if end == -1 else end
+            literal += text[i + 1 : end]
+            i = end + 1
+        elif text.startswith("$'", i) and not is_quoted:
+            end = i + 2
+            while end < len(text) and text[end] != "'":
+                end += 2 if text[end] == "\\" else 1
+            add(("ansi-c", text[i + 2 : end]))
+            i = end + 1
+        elif text.startswith("$((", i):
+            end = find_closing(text, i + 3, "(", ")")
+            add(("arithmetic", "".join(text[i + 3 : end].split()), is_quoted))
+            i = end + 2
+        elif text.startswith("${", i):
+            end = find_closing(text, i + 2, "{", "}")
+            add(("parameter", text[i + 2 : end], is_quoted))
+            i = end + 1
+        elif (
+            c in "$<>"
+            and text.startswith("(", i + 1)
+            and (c == "$" or not is_quoted)
+        ):
+            end = find_closing(text, i + 2, "(", ")")
+            add(
+                (
+                    "substitution",
+                    c,
+                    _get_substitution_key(
+                        text[i + 2 : end], next(substitutions, None)
+                    ),
+                    is_quoted,
+                )
+            )
+            i = end + 1
+        elif c == "`":
+            end = i + 1
+            while end < len(text) and text[end] != "`":
+                end += 2 if text[end] == "\\" else 1
+            add(
+                (
+                    "substitution",
+                    "$",
+                    _get_substitution_key(
+                        text[i + 1 : end], next(substitutions, None)
+                    ),
+                    is_quoted,
+                )
+            )
+            i = end + 1
+        elif match := _PARAMETER.match(text, i):
+            add(("parameter", match.group()[1:], is_quoted))
+            i = match.end()
+        elif c in _SPECIAL_CHARACTERS and not is_quoted:
+            add(("special", c))
+            i += 1
+        else:
+            literal += c
+            i += 1
+
+    if literal:
+        parts.append(literal)
+
+    return tuple(parts)
+
+
+def _get_substitution_key(
+    text: str, command_list: Optional[CommandList]
+) -> Hashable:
+    if command_list is None:
+        return text.strip()
+
+    return _get_list_key(command_list)
+
+
+def _get_word_key(word: Word) -> Hashable:
+    return _get_text_key(word.text, iter(word.substitutions))
+
+
+def _get_redirection_key(redirection: Redirection) -> Hashable:
+    start = redirection.text.find(redirection.operator)
+    target = redirection.text[start + len(redirection.operator) :].strip()
+
+    if redirection.operator in ("<<", "<<-"):
+        # Any quoting of the delimiter disables expansions in the body
+        target_key: Hashable = (
+            redirection.target,
+            any(c in target for c in "'\"\\"),
+        )
+    else:
+        target_key = _get_text_key(target, iter([]))
+
+    return (
+        redirection.text[:start],
+        redirection.operator,
+        target_key,
+        redirection.body,
+    )
+
+
+def _get_command_key(command: Command) -> Hashable:
+    return (
+        tuple(_get_word_key(word) for word in command.assignments),
+        tuple(_get_word_key(word) for word in command.words),
+        tuple(
+            _get_redirection_key(redirection)
+            for redirection in command.redirections
+        ),
+    )
+
+
+def _get_list_key(command_list: CommandList) -> Hashable:
+    return tuple(
+        (segment.operator, segment.key)
+        for segment in _get_segments(command_list)
+    )
+
+
+def _get_segments(command_list: CommandList) -> list[Segment]:
+    segments = []
+    for pipeline, separator in zip(
+        command_list.pipelines, command_list.separators
+    ):
+        for i, command in enumerate(pipeline.commands):
+            if i > 0:
+                operator = "|"
+            else:
+                # A newline separates commands just like a semicolon
+                operator = separator.strip() or (";" if separator else "")
+            segments.append(
+                Segment(command.text, operator, _get_command_key(command))
+            )
+
+    return segments
+
+
+def split_segments(shell_command: str) -> Optional[list[Segment]]:
+    """
+    Splits a shell command into the simple commands of its pipelines and
+    lists. Returns None if the command can't be parsed.
+    """
+
+    try:
+        return _get_segments(parse(shell_command))
+    except ShellSyntaxError:
+        return None
+
+
+def get_semantic_key(shell_command: str) -> Hashable:
+    """
+    Returns a key that is equal for shell commands that only differ in
+    whitespace and quoting that don't change their meaning, e.g. `ls a`
+    and `ls 'a'`, but not `rm *` and `rm '*'`. Commands that can't be
+    parsed are compared as text.
+    """
+
+    segments = split_segments(shell_command)
+    if segments is None:
+        return shell_command.strip()
+
+    return tuple((segment.operator, segment.key) for segment in segments)
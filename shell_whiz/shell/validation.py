@@ -0,0 +1,216 @@
+import os
+import shutil
+import subprocess
+from typing import Optional
+
+from shell_whiz.cache import Cache
+
+from .manpages import read_manual
+from .parser import Command, ShellSyntaxError, UnsupportedSyntaxError, parse
+from .programs import BUILTINS, get_missing_programs
+
+# Shells that check the syntax without running anything when given `-n`
+_POSIX_SHELLS = frozenset(
+    {"sh", "bash", "dash", "ksh", "mksh", "zsh", "yash", "fish"}
+)
+
+_POWERSHELLS = frozenset({"pwsh", "powershell"})
+
+# Names of the executables of shells, if they differ from the names
+_SHELL_EXECUTABLES = {"powershell": ("pwsh", "powershell")}
+
+# PowerShell reports parse errors when it compiles the script block
+_POWERSHELL_CHECK = "$null = [ScriptBlock]::Create([Console]::In.ReadToEnd())"
+
+# Man pages listing fewer flags are likely incomplete
+_MIN_FLAGS = 5
+
+
+def find_shell(name: str) -> Optional[str]:
+    """Returns the path to the executable of a shell, if it is installed."""
+
+    name = name.lower()
+    for executable in _SHELL_EXECUTABLES.get(name, (name,)):
+        path = shutil.which(executable)
+        if path:
+            return path
+
+    return None
+
+
+def check_syntax(script: str, shell: str) -> Optional[str]:
+    """
+    Checks the syntax of a script with the given shell without running
+    it. Returns the description of the error, if any. Shells that can't
+    check the syntax are assumed to accept any script.
+    """
+
+    name = os.path.splitext(os.path.basename(shell))[0].lower()
+    if name in _POSIX_SHELLS:
+        args = [shell, "-n", "-c", script]
+        stdin = None
+    elif name in _POWERSHELLS:
+        args = [
+            shell,
+            "-NoProfile",
+            "-NonInteractive",
+            "-Command",
+            _POWERSHELL_CHECK,
+        ]
+        stdin = script
+    else:
+        return None
+
+    try:
+        process = subprocess.run(
+            args,
+            input=stdin,
+            capture_output=True,
+            text=True,
+            timeout=5 if stdin else 2,
+            stdin=None if stdin else subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    if process.returncode == 0:
+        return None
+
+    error = process.stderr.strip().splitlines()
+    return f"Syntax error: {error[0] if error else 'unknown'}."
+
+
+def _get_leading_flags(command: Command) -> list[str]:
+    # Flags after the first operand may belong to a subcommand,
+    # e.g. `git commit --amend`, so they aren't checked
+    flags = []
+    for word in command.arguments:
+        if word.value == "--" or not word.value.startswith("-"):
+            break
+        flags.append(word.value)
+    return flags
+
+
+class ShellCommandValidator:
+    """
+    Finds problems in a shell command without running it: syntax errors
+    reported by the shell, programs missing from $PATH and flags that
+    aren't mentioned in the man page of the program. The results are
+    cached per command, unless a program is missing, since it may be
+    installed before the command is checked again.
+    """
+
+    def __init__(self, cache: Optional[Cache] = None) -> None:
+        self.__cache = cache
+
+    def validate(
+        self, shell_command: str, *, shell: Optional[str] = None
+    ) -> list[str]:
+        """Returns descriptions of the problems, if any."""
+
+        key = Cache.make_key("command", shell or "", shell_command)
+        if self.__cache:
+            problems = self.__cache.get(key)
+            if problems is not None:
+                return problems
+
+        problems, is_complete = self.__validate(shell_command, shell)
+
+        if self.__cache and is_complete:
+            self.__cache.set(key, problems)
+
+        return problems
+
+    def save(self) -> None:
+        if self.__cache:
+            self.__cache.save()
+
+    def __validate(
+        self, shell_command: str, shell: Optional[str]
+    ) -> tuple[list[str], bool]:
+        """
+        Returns the problems and whether they only depend on the command,
+        i.e. all of its programs are installed.
+        """
+
+        if shell:
+            error = check_syntax(shell_command, shell)
+            if error:
+                return [error], True
+
+        try:
+            command_list = parse(shell_command)
+        except UnsupportedSyntaxError:
+            return [], True
+        except ShellSyntaxError:
+            # The shell didn't complain, so the parser is too strict
+            return [], True
+
+        missing_programs = get_missing_programs(command_list)
+        problems = [
+            f"`{program}` is not installed." for program in missing_programs
+        ]
+
+        for command in command_list.commands:
+            program = command.program
+            if (
+                not program
+                or program in BUILTINS
+                or "$" in command.words[0].text
+            ):
+                continue
+
+            flags = _get_leading_flags(command)
+            if not flags:
+                continue
+
+            known_flags = self.__get_flags(program)
+            if len(known_flags) < _MIN_FLAGS:
+                continue
+
+            for flag in flags:
+                if not self.__is_known_flag(flag, known_flags):
+                    problems.append(f"`{program}` has no `{flag}` flag.")
+
+        return problems, not missing_programs
+
+    def __is_known_flag(self, flag: str, known_flags: list[str]) -> bool:
+        name = flag.partition("=")[0]
+        if name in known_flags:
+            return True
+        elif name[1:].isdigit():
+            # A number, e.g. `head -5` or `kill -9`, is rarely listed
+            return True
+        elif name.startswith("--"):
+            return False
+        elif len(name) == 2:
+            return False
+
+        # Bundled short flags, e.g. `-la`, or a short flag with a value,
+        # e.g. `-n5`, can't be told apart reliably, so only the first
+        # one is checked
+        return name[:2] in known_flags
+
+    def __get_flags(self, program: str) -> list[str]:
+        path = shutil.which(program)
+        if path is None:
+            return []
+
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return []
+
+        key = Cache.make_key("flags", path, str(mtime))
+        if self.__cache:
+            flags = self.__cache.get(key)
+            if flags is not None:
+                return flags
+
+        _, manual_flags = read_manual(os.path.basename(path))
+        flags = sorted(manual_flags)
+
+        if self.__cache:
+            self.__cache.set(key, flags)
+
+        return flags